@@ -1,9 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.tokens import UntypedToken
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from profiles.models import CustomUser
+
+# Claims copied into tokens so a request user can be built without loading the row
+TOKEN_USER_CLAIMS = ('username',)
+
+
+def token_for_user(user):
+    refresh = RefreshToken.for_user(user)
+    for claim in TOKEN_USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
+
+
+# Bounded, per-process cache of (is_active, is_admin) by user id. Entries expire after `ttl` seconds,
+# so deactivating a user takes effect in every worker within that window.
+class UserStateCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(user_id)
+                return entry[1]
+
+        # A missing user is cached too, as revoked
+        state = CustomUser.objects.filter(pk=user_id).values_list('is_active', 'is_admin').first() or (False, False)
+        with self.lock:
+            self.entries[user_id] = (now + self.ttl, state)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return state
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_state_cache = UserStateCache(
+    max_size=settings.JWT_USER_STATE_CACHE_SIZE,
+    ttl=settings.JWT_USER_STATE_TTL,
+)
+
 
 class CustomJWTAuthentication(BaseAuthentication):
+    jwt_auth = JWTAuthentication()
+
     def authenticate(self, request):
         auth_header = request.headers.get('Authorization', None)
         if not auth_header:
@@ -14,9 +74,30 @@ class CustomJWTAuthentication(BaseAuthentication):
             if prefix.lower() != 'bearer':
                 raise AuthenticationFailed('Invalid token header. No credentials provided.')
 
-            jwt_auth = JWTAuthentication()
-            return jwt_auth.authenticate(request)
+            validated_token = self.jwt_auth.get_validated_token(token.encode())
+            if settings.JWT_AUTH_USER_MODE == 'token':
+                return self.get_token_user(validated_token), validated_token
+            return self.jwt_auth.get_user(validated_token), validated_token
         except ValueError:
             raise AuthenticationFailed('Invalid token header. No credentials provided.')
         except Exception as e:
             raise AuthenticationFailed(str(e))
+
+    def get_token_user(self, validated_token):
+        # Tokens issued before the identity claims were added still go through the database
+        if any(claim not in validated_token for claim in TOKEN_USER_CLAIMS):
+            return self.jwt_auth.get_user(validated_token)
+
+        # simplejwt stores the id as a string; compare and cache it as the real primary key type
+        user_id = CustomUser._meta.pk.to_python(validated_token[jwt_settings.USER_ID_CLAIM])
+        is_active, is_admin = user_state_cache.get(user_id)
+        if not is_active:
+            raise AuthenticationFailed('User is inactive')
+
+        # An unsaved-looking instance carrying only the primary key and the signed claims;
+        # it works for filters and foreign keys, but other fields must be loaded explicitly.
+        user = CustomUser(id=user_id, is_active=is_active, is_admin=is_admin,
+                          **{claim: validated_token[claim] for claim in TOKEN_USER_CLAIMS})
+        user._state.adding = False
+        user._state.db = CustomUser.objects.db
+        return user
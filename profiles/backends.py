@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Case, Q, Value, When
+
+UserModel = get_user_model()
+
+
+# Resolves a login identifier that may be a username or an email in one query over the two unique
+# indexes, and verifies the password once. Unknown identifiers still pay for one hash, so a failed
+# login takes as long whether or not the account exists.
+class UsernameOrEmailBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        # A username that matches wins over another account's email
+        user = (
+            UserModel._default_manager.filter(Q(username=username) | Q(email=username))
+            .order_by(Case(When(username=username, then=Value(0)), default=Value(1)))
+            .first()
+        )
+        if user is None:
+            # Run the default hasher once so a missing account isn't faster to reject
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
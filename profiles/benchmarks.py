@@ -0,0 +1,208 @@
+import statistics
+import time
+import tracemalloc
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.test import APIClient
+from profiles.authentication import token_for_user, user_state_cache
+from profiles.models import CustomUser, Follow, Post, Comment, Story, StoryView, MediaUpload
+
+# Endpoint benchmarks: every view under profiles/urls/ is requested as a generated user, and latency,
+# query count and peak Python memory are recorded per endpoint and method.
+#
+# The whole run happens inside one transaction that is rolled back at the end, and every request
+# runs in its own savepoint, so write endpoints can be measured repeatedly without changing the data.
+
+METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+# How to call each endpoint: URL kwargs, query string, request body (per method or for all of them)
+# and whether it needs an admin. Endpoints with no entry are requested without arguments.
+ENDPOINTS = {
+    'signup': {'data': lambda f: {
+        'username': 'benchmark_signup', 'fullname': 'Benchmark Signup', 'email': 'benchmark_signup@example.com',
+        'dob': '1990-01-01', 'password': f.password,
+    }},
+    'login': {'data': lambda f: {'username_or_email': f.viewer.username, 'password': f.password}},
+    'list_users': {'query': lambda f: {'username': f.stranger.username[:6]}},
+    'suggest_users': {'query': lambda f: {'q': f.stranger.username[:6]}},
+    'follow-user': {'kwargs': lambda f: {'user_id': f.stranger.id}},
+    'unfollow-user': {'kwargs': lambda f: {'user_id': f.followed.id}},
+    'post-detail': {
+        'kwargs': lambda f: {'pk': f.post.id},
+        'data': lambda f: {'title': 'Benchmark edit', 'description': 'Benchmark edit'},
+    },
+    'create-post': {'data': lambda f: {'title': 'Benchmark', 'description': 'Benchmark post'}},
+    'like-post': {'kwargs': lambda f: {'post_id': f.followed_post.id}},
+    'comment-post': {'kwargs': lambda f: {'post_id': f.followed_post.id}, 'data': lambda f: {'content': 'Benchmark comment'}},
+    'edit-comment': {'kwargs': lambda f: {'pk': f.comment.id}, 'data': lambda f: {'content': 'Benchmark edit'}},
+    'delete-comment': {'kwargs': lambda f: {'pk': f.comment.id}},
+    'delete-any-comment': {'kwargs': lambda f: {'post_id': f.post.id, 'pk': f.comment.id}},
+    'post-comments': {'kwargs': lambda f: {'post_id': f.popular_post.id}},
+    'add_or_remove_favorite': {'kwargs': lambda f: {'post_id': f.followed_post.id}},
+    'share-post-to-timeline': {'data': lambda f: {'post_id': f.followed_post.id}},
+    'toggle-block': {'kwargs': lambda f: {'user_id': f.stranger.id}},
+    'create-story': {'data': lambda f: {'description': 'Benchmark story'}},
+    'share-post-to-story': {'data': lambda f: {'post_id': f.followed_post.id}},
+    'view-story': {'kwargs': lambda f: {'pk': f.friend_story.id}},
+    'track-story': {'kwargs': lambda f: {'pk': f.friend_story.id}},
+    'story-viewers': {'kwargs': lambda f: {'story_id': f.story.id}},
+    'story-view-count': {'kwargs': lambda f: {'story_id': f.story.id}},
+    'create-upload': {'data': lambda f: {'filename': 'benchmark.jpg', 'size': 1024}},
+    'upload-detail': {'kwargs': lambda f: {'upload_id': f.upload.pk}},
+    'complete-upload': {'kwargs': lambda f: {'upload_id': f.upload.pk}},
+    'cache-stats': {'admin': True},
+    'connection-stats': {'admin': True},
+}
+
+
+def discover_endpoints():
+    """Return [(url name, [methods])] for every named URL served by a profiles view."""
+    endpoints = []
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name and pattern.callback.__module__.startswith('profiles.views'):
+                view_class = getattr(pattern.callback, 'cls', None)
+                methods = [method for method in METHODS if view_class is not None and hasattr(view_class, method)]
+                endpoints.append((pattern.name, methods))
+
+    walk(get_resolver().url_patterns)
+    return endpoints
+
+
+# Sample rows the endpoints are called with. The viewer is the user following the most accounts,
+# which gives the largest feeds; rows the viewer needs to own are created inside the run's transaction.
+class BenchmarkFixtures:
+    def __init__(self, password):
+        self.password = password
+        self.viewer = CustomUser.objects.filter(is_active=True).order_by('-following_count', 'id').first()
+        if self.viewer is None:
+            raise ValueError('The database has no users; run generate_social_graph first.')
+        followed_ids = Follow.objects.filter(follower=self.viewer).values_list('followed_id', flat=True)
+        self.followed = CustomUser.objects.filter(id__in=followed_ids).order_by('-follower_count', 'id').first()
+        self.stranger = (
+            CustomUser.objects.exclude(id__in=followed_ids).exclude(id=self.viewer.id).order_by('-follower_count', 'id').first()
+        )
+        if self.followed is None:
+            self.followed = self.stranger
+            Follow.objects.create(follower=self.viewer, followed=self.followed)
+
+        self.post = Post.objects.create(user=self.viewer, title='Benchmark', description='Benchmark post')
+        self.comment = Comment.objects.create(user=self.viewer, post=self.post, content='Benchmark comment')
+        self.story = Story.objects.create(user=self.viewer, description='Benchmark story')
+        StoryView.objects.create(story=self.story, user=self.followed)
+        self.followed_post = Post.objects.filter(user=self.followed).order_by('-created_at').first() or \
+            Post.objects.create(user=self.followed, title='Benchmark', description='Benchmark post')
+        self.friend_story = Story.objects.create(user=self.followed, description='Benchmark story')
+        self.popular_post = Post.objects.order_by('-comment_count', 'id').first()
+        # No temporary file is written, so only the status and error paths of the upload endpoints run
+        self.upload = MediaUpload.objects.create(user=self.viewer, filename='benchmark.jpg', size=1024)
+
+
+# Counts statements through an execute wrapper; the request_started signal resets connection.queries
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Savepoint statements are the harness's, not the endpoint's
+        if 'SAVEPOINT' not in sql.upper():
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class BenchmarkRunner:
+    def __init__(self, iterations=20, password='password123', names=None):
+        self.iterations = iterations
+        self.password = password
+        self.names = set(names) if names else None
+
+    def run(self):
+        """Benchmark every endpoint and return {"METHOD url-name": result}."""
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+            fixtures = BenchmarkFixtures(self.password)
+            client = APIClient(raise_request_exception=False)  # A failing endpoint is reported, not fatal
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token_for_user(fixtures.viewer).access_token}')
+
+            for name, methods in discover_endpoints():
+                if self.names is not None and name not in self.names:
+                    continue
+                spec = ENDPOINTS.get(name, {})
+                for method in methods:
+                    results[f'{method.upper()} {name}'] = self.measure(client, fixtures, name, method, spec)
+            transaction.set_rollback(True)
+        user_state_cache.discard(fixtures.viewer.id)
+        return results
+
+    def request(self, client, fixtures, name, method, spec):
+        url = reverse(name, kwargs=spec['kwargs'](fixtures) if 'kwargs' in spec else None)
+        if 'query' in spec:
+            url = f"{url}?{urlencode(spec['query'](fixtures))}"
+        data = spec['data'](fixtures) if 'data' in spec and method != 'get' else None
+
+        with transaction.atomic():
+            if spec.get('admin'):
+                CustomUser.objects.filter(pk=fixtures.viewer.pk).update(is_admin=True)
+                user_state_cache.discard(fixtures.viewer.pk)
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, format='json')
+            elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        if spec.get('admin'):
+            user_state_cache.discard(fixtures.viewer.pk)
+        return response, elapsed
+
+    def measure(self, client, fixtures, name, method, spec):
+        response, cold = self.request(client, fixtures, name, method, spec)
+        timings = [self.request(client, fixtures, name, method, spec)[1] for _ in range(self.iterations)]
+
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            self.request(client, fixtures, name, method, spec)
+
+        tracemalloc.start()
+        try:
+            self.request(client, fixtures, name, method, spec)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'cold_ms': round(cold, 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(_percentile(timings, 0.5), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'queries': queries.count,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+
+def compare(results, baseline, tolerance, min_delta_ms=1.0):
+    """
+    Compare two result sets shaped {scale: {endpoint: result}} and return a list of regressions: a
+    p50 latency more than `tolerance` (a fraction) and `min_delta_ms` above the baseline, or more queries.
+    """
+    regressions = []
+    for scale, endpoints in results.items():
+        for endpoint, result in endpoints.items():
+            previous = baseline.get(scale, {}).get(endpoint)
+            if previous is None:
+                continue
+            slower = result['p50_ms'] - previous['p50_ms']
+            if slower > min_delta_ms and result['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{scale} {endpoint}: p50 {previous['p50_ms']}ms -> {result['p50_ms']}ms")
+            if result['queries'] > previous['queries']:
+                regressions.append(f"{scale} {endpoint}: queries {previous['queries']} -> {result['queries']}")
+    return regressions
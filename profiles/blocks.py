@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from profiles.models import Block
+from profiles.routers import reads_for_cache
+
+# Block enforcement for reads. A viewer never sees content from users they blocked or users who
+# blocked them; the union of both is cached per viewer as one set of ids, so read paths apply it with
+# a single `user_id__in` exclusion or set lookup. Toggling a block drops the set of both users.
+#
+# The sets live in the 'shared' cache: a per-process cache would keep showing a blocked user's content
+# in every other worker until its entry expired.
+
+HIDDEN_USERS_CACHE_KEY = 'hidden_users:{user_id}'
+
+
+def hidden_users_cache_key(user_id):
+    return HIDDEN_USERS_CACHE_KEY.format(user_id=user_id)
+
+
+def hidden_user_ids(user):
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    key = hidden_users_cache_key(user.id)
+    hidden = caches['shared'].get(key)
+    if hidden is None:
+        with reads_for_cache():
+            pairs = list(Block.objects.filter(Q(blocker_id=user.id) | Q(blocked_id=user.id)).values_list('blocker_id', 'blocked_id'))
+        hidden = frozenset(user_id for pair in pairs for user_id in pair) - {user.id}
+        caches['shared'].set(key, hidden, settings.BLOCK_CACHE_TIMEOUT)
+    return hidden
+
+
+def invalidate_hidden_users(user_ids):
+    caches['shared'].delete_many([hidden_users_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,199 @@
+import hashlib
+import threading
+from collections import defaultdict
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+from profiles.blocks import hidden_user_ids
+from profiles.routers import reads_for_cache
+from profiles.conditional import is_not_modified, make_etag, not_modified_response, parse_last_modified, set_validators
+
+# Response cache for hot read endpoints.
+#
+# Cached entries live under one or more namespaces (e.g. "post:12"). Each namespace carries a version
+# number that is part of every key built from it, so invalidating a namespace is a single increment:
+# entries under the old version are never read again and age out of the backend on their own. The
+# versions are kept where every worker reads them, so a write invalidates entries in all processes
+# while the entries themselves can stay in a per-process cache.
+
+
+class CacheBackend:
+    """Interface a response cache backend must implement: `get_many` and `incr` read and bump namespace
+    versions, `get` and `set` hold the entries."""
+
+    def get_many(self, keys):
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, timeout):
+        raise NotImplementedError
+
+    def incr(self, key):
+        raise NotImplementedError
+
+
+class DjangoCacheBackend(CacheBackend):
+    """Stores entries and namespace versions in caches configured in settings.CACHES."""
+
+    def __init__(self, alias='default', version_alias=None):
+        self.cache = caches[alias]
+        self.versions = caches[version_alias or alias]
+
+    def get_many(self, keys):
+        return self.versions.get_many(keys)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    def incr(self, key):
+        # add() is a no-op when the key exists, so concurrent first bumps don't lose an increment
+        self.versions.add(key, 1, None)
+        return self.versions.incr(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                options = dict(settings.RESPONSE_CACHE)
+                backend_class = import_string(options.pop('BACKEND'))
+                options.pop('TIMEOUT', None)
+                _backend = backend_class(**{key.lower(): value for key, value in options.items()})
+    return _backend
+
+
+class CacheStats:
+    """Per-process hit and miss counters, by endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    def record(self, name, hit):
+        with self.lock:
+            self.counts[name]['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            endpoints = {name: dict(counts) for name, counts in self.counts.items()}
+        hits = sum(counts['hits'] for counts in endpoints.values())
+        misses = sum(counts['misses'] for counts in endpoints.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else None,
+            'endpoints': endpoints,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+cache_stats = CacheStats()
+
+
+def _version_key(namespace):
+    return f'cache_ns:{namespace}'
+
+
+def namespace_stamp(namespaces):
+    """The current version of each namespace, as one string."""
+    if not namespaces:
+        return ''
+    version_keys = [_version_key(namespace) for namespace in namespaces]
+    versions = get_backend().get_many(version_keys)
+    return ','.join(f'{namespace}@{versions.get(key, 0)}' for namespace, key in zip(namespaces, version_keys))
+
+
+def build_key(namespaces, suffix):
+    return f'response:{namespace_stamp(namespaces)}:{suffix}'
+
+
+def invalidate(*namespaces):
+    backend = get_backend()
+    for namespace in namespaces:
+        backend.incr(_version_key(namespace))
+
+
+def cached_response(name, namespaces, per_user=False, vary_on_blocks=False, depends_on=None, last_modified=None):
+    """
+    Cache the data of a view's successful GET response.
+
+    `namespaces(view, request, **kwargs)` returns the namespaces the response depends on; bumping any
+    of them with `invalidate()` drops the entry. `per_user` keys the entry by the viewer as well, for
+    responses that contain viewer-specific fields. `vary_on_blocks` keys the entry by the viewer's set of
+    blocked and blocking users, so viewers without blocks still share one entry and a block applies in
+    every worker as soon as the shared set changes, whatever this worker's cache still holds.
+
+    `depends_on(data)` returns further namespaces that are only known from the response itself, such as
+    the original of a reshare; the entry is dropped once any of them is bumped. They are part of the ETag
+    too, so a response whose contents move with the clock should name what it holds.
+
+    The namespaces are looked up, and a miss runs the view, against the primary even in a view marked
+    with `use_read_replica`: the entry is served to every viewer, so it must not keep a lagging replica's
+    data after an invalidation.
+
+    Each entry is stored with an ETag built from its namespace versions, never from its data, and
+    `last_modified(data)` returns the timestamp sent as Last-Modified, so conditional requests are
+    answered with a 304 straight from the cache.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            suffix = request.get_full_path()
+            if per_user:
+                suffix = f'{suffix}|user={request.user.pk}'
+            if vary_on_blocks:
+                hidden = hidden_user_ids(request.user)
+                if hidden:
+                    digest = hashlib.md5(','.join(map(str, sorted(hidden))).encode()).hexdigest()
+                    suffix = f'{suffix}|hidden={digest}'
+            with reads_for_cache():
+                key = build_key(namespaces(self, request, **kwargs), suffix)
+
+            entry = get_backend().get(key)
+            if entry is not None and namespace_stamp(entry['dependencies']) != entry['dependency_stamp']:
+                entry = None  # A namespace named by the data was invalidated since
+            if entry is None:
+                cache_stats.record(name, hit=False)
+                with reads_for_cache():
+                    response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                data = response.data
+                dependencies = depends_on(data) if depends_on else []
+                dependency_stamp = namespace_stamp(dependencies)
+                # The key and dependency stamps cover every invalidation, and are the same in every worker
+                # and after a rebuild, so an unchanged response keeps its ETag
+                etag = make_etag(key, dependency_stamp)
+                get_backend().set(key, {
+                    'data': data,
+                    'etag': etag,
+                    'dependencies': dependencies,
+                    'dependency_stamp': dependency_stamp,
+                }, settings.RESPONSE_CACHE['TIMEOUT'])
+            else:
+                cache_stats.record(name, hit=True)
+                data, etag = entry['data'], entry['etag']
+                response = Response(data, status=status.HTTP_200_OK)
+
+            modified = parse_last_modified(last_modified(data)) if last_modified else None
+            if is_not_modified(request, etag, modified):
+                return not_modified_response(etag, modified)
+            return set_validators(response, etag, modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,78 @@
+import hashlib
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+# Conditional GET: responses carry an ETag (and a Last-Modified date where the resource has one), and a
+# request whose If-None-Match / If-Modified-Since validators still match gets an empty 304 instead of
+# the body. Validators are computed from data the view already has (cache entries, page rows), never by
+# serializing the response first.
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def parse_last_modified(value):
+    """A serialized timestamp (e.g. a post's updated_at) as an HTTP date, or None."""
+    moment = parse_datetime(value) if isinstance(value, str) else value
+    return http_date(moment.timestamp()) if moment else None
+
+
+def is_not_modified(request, etag=None, last_modified=None):
+    # As in RFC 9110, If-None-Match takes precedence and If-Modified-Since is only used without it
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    if if_modified_since is None or last_modified is None:
+        return False
+    return parse_http_date_safe(last_modified) <= if_modified_since
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = last_modified
+    return response
+
+
+def not_modified_response(etag=None, last_modified=None):
+    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+def author_summary(user):
+    # What PostAuthorSerializer shows
+    return user.pk, user.username, user.fullname
+
+
+# ETags for paginated post lists, from the page's rows before they are serialized. A row's updated_at
+# moves with every edit and counter change; the embedded author summaries and a reshare's original
+# are checked as well.
+class ConditionalPostListMixin:
+    etag = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        self.etag = make_etag(request.get_full_path(), request.user.pk, [
+            (post.id, post.updated_at, author_summary(post.user), *(
+                (post.original_post.updated_at, author_summary(post.original_post.user)) if post.original_post_id else ()
+            ))
+            for post in page
+        ])
+        if is_not_modified(request, self.etag):
+            return not_modified_response(self.etag)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, self.etag)
+        return super().finalize_response(request, response, *args, **kwargs)
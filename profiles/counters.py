@@ -0,0 +1,102 @@
+from collections import Counter
+from django.db.models import Count, F
+from django.db.models.functions import Greatest, Now
+from django.utils import timezone
+from profiles.models import CustomUser, Follow, Post, Like, Comment, Favorite, Story
+
+# Denormalized counters are kept in step with atomic F() updates when rows are written,
+# and the reconcile_* helpers repair any drift in bulk.
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _adjust(queryset, field, delta, **changes):
+    # Greatest keeps a counter at zero if a decrement races a reconcile
+    queryset.update(**{field: Greatest(F(field) + delta, 0)}, **changes)
+
+
+def adjust_follow_counts(follower_id, followed_id, delta):
+    _adjust(CustomUser.objects.filter(pk=follower_id), 'following_count', delta)
+    _adjust(CustomUser.objects.filter(pk=followed_id), 'follower_count', delta)
+
+
+def adjust_post_count(post_id, field, delta):
+    # update() skips auto_now; a counter change is a change for conditional GETs
+    _adjust(Post.objects.filter(pk=post_id), field, delta, updated_at=Now())
+
+
+def _grouped_counts(queryset, group_by, ids):
+    return dict(
+        queryset.filter(**{f'{group_by}__in': ids})
+        .values_list(group_by)
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+
+
+# Recount follower/following totals batch by batch and fix the users that drifted
+def reconcile_follow_counts(batch_size=RECONCILE_BATCH_SIZE):
+    fixed = 0
+    last_id = 0
+    while True:
+        users = list(
+            CustomUser.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .only('id', 'follower_count', 'following_count')[:batch_size]
+        )
+        if not users:
+            return fixed
+        last_id = users[-1].pk
+
+        ids = [user.pk for user in users]
+        follower_counts = _grouped_counts(Follow.objects, 'followed_id', ids)
+        following_counts = _grouped_counts(Follow.objects, 'follower_id', ids)
+
+        drifted = []
+        for user in users:
+            follower_count = follower_counts.get(user.pk, 0)
+            following_count = following_counts.get(user.pk, 0)
+            if (user.follower_count, user.following_count) != (follower_count, following_count):
+                user.follower_count = follower_count
+                user.following_count = following_count
+                drifted.append(user)
+        CustomUser.objects.bulk_update(drifted, ['follower_count', 'following_count'])
+        fixed += len(drifted)
+
+
+POST_COUNTERS = (
+    ('like_count', Like.objects, 'post_id'),
+    ('comment_count', Comment.objects, 'post_id'),
+    ('favorite_count', Favorite.objects, 'post_id'),
+    ('share_count', Story.objects, 'shared_post_id'),
+    ('share_count', Post.objects, 'original_post_id'),  # Shares are story shares plus timeline reshares
+)
+
+
+# Recount engagement totals batch by batch and fix the posts that drifted
+def reconcile_post_counts(batch_size=RECONCILE_BATCH_SIZE):
+    fields = list(dict.fromkeys(field for field, _, _ in POST_COUNTERS))
+    fixed = 0
+    last_id = 0
+    while True:
+        posts = list(Post.objects.filter(pk__gt=last_id).order_by('pk').only('id', *fields)[:batch_size])
+        if not posts:
+            return fixed
+        last_id = posts[-1].pk
+
+        ids = [post.pk for post in posts]
+        totals = {field: Counter() for field in fields}
+        for field, queryset, group_by in POST_COUNTERS:
+            totals[field].update(_grouped_counts(queryset, group_by, ids))
+
+        drifted = []
+        now = timezone.now()
+        for post in posts:
+            actual = {field: totals[field].get(post.pk, 0) for field in fields}
+            if any(getattr(post, field) != value for field, value in actual.items()):
+                for field, value in actual.items():
+                    setattr(post, field, value)
+                post.updated_at = now
+                drifted.append(post)
+        Post.objects.bulk_update(drifted, [*fields, 'updated_at'])
+        fixed += len(drifted)
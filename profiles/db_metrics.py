@@ -0,0 +1,49 @@
+import os
+import threading
+from collections import defaultdict
+from django.db import connections
+
+# Per-process database connection counters. Each new connection is counted as it is opened and every
+# request as it starts, so `reuse_rate` is the share of requests served on an already open connection
+# (close to 1 with persistent connections, 0 when every request reconnects).
+class ConnectionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.opened = defaultdict(int)
+        self.requests = 0
+
+    def record_connection(self, alias):
+        with self.lock:
+            self.opened[alias] += 1
+
+    def record_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def snapshot(self):
+        with self.lock:
+            opened, requests = dict(self.opened), self.requests
+        aliases = {}
+        for alias in connections:
+            settings_dict = connections.settings[alias]
+            aliases[alias] = {
+                'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0),
+                'conn_health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+                'connections_opened': opened.get(alias, 0),
+            }
+        # Requests run their queries on the default alias
+        default_opened = opened.get('default', 0)
+        return {
+            'pid': os.getpid(),
+            'requests': requests,
+            'reuse_rate': max(0.0, 1 - default_opened / requests) if requests else None,
+            'aliases': aliases,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.opened.clear()
+            self.requests = 0
+
+
+connection_stats = ConnectionStats()
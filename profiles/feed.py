@@ -0,0 +1,207 @@
+import heapq
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from profiles.models import CustomUser, Post, Follow, TimelineEntry
+from profiles.blocks import hidden_user_ids
+from profiles.pagination import keyset_filter
+
+# Feeds are hybrid: posts by ordinary authors are pushed into timelines when written,
+# posts by high-fanout authors are pulled at read time and merged with the pushed ones.
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def _bulk_push(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def _is_high_fanout(author):
+    # Read from the row: the author may be a request user built from token claims
+    is_high_fanout, follower_count = CustomUser.objects.values_list('is_high_fanout', 'follower_count').get(pk=author.id)
+    if is_high_fanout:
+        return True
+    if follower_count < settings.FEED_FANOUT_THRESHOLD:
+        return False
+
+    # Sticky on purpose: once an author is pulled, all of their posts stay reachable through the pull path
+    CustomUser.objects.filter(pk=author.id).update(is_high_fanout=True)
+    author.is_high_fanout = True
+    return True
+
+
+# Push a newly written post into the timelines of its author's followers and followings
+def fan_out_post(post):
+    author = post.user
+    following_ids = set(Follow.objects.filter(follower_id=author.id).values_list('followed_id', flat=True))
+
+    batch = []
+    if not _is_high_fanout(author):
+        follower_ids = Follow.objects.filter(followed_id=author.id).values_list('follower_id', flat=True)
+        for follower_id in follower_ids.iterator(chunk_size=FANOUT_BATCH_SIZE):
+            batch.append(TimelineEntry(
+                owner_id=follower_id, post_id=post.id, created_at=post.created_at,
+                follows_author=True, followed_by_author=follower_id in following_ids,
+            ))
+            following_ids.discard(follower_id)
+            if len(batch) >= FANOUT_BATCH_SIZE:
+                _bulk_push(batch)
+                batch = []
+
+    # Whoever the author follows sees the post in their followers feed
+    for followed_id in following_ids:
+        batch.append(TimelineEntry(
+            owner_id=followed_id, post_id=post.id, created_at=post.created_at,
+            follows_author=False, followed_by_author=True,
+        ))
+    if batch:
+        _bulk_push(batch)
+
+
+def _link(owner_id, author_id, reason):
+    recent_posts = list(
+        Post.objects.filter(user_id=author_id)
+        .order_by('-created_at')
+        .values_list('id', 'created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    TimelineEntry.objects.filter(owner_id=owner_id, post__user_id=author_id).update(**{reason: True})
+    _bulk_push([
+        TimelineEntry(owner_id=owner_id, post_id=post_id, created_at=created_at, **{reason: True})
+        for post_id, created_at in recent_posts
+    ])
+
+
+def _unlink(owner_id, author_id, reason):
+    entries = TimelineEntry.objects.filter(owner_id=owner_id, post__user_id=author_id)
+    entries.update(**{reason: False})
+    entries.filter(follows_author=False, followed_by_author=False).delete()
+
+
+# Backfill both timelines touched by a new follow; `followed` must be loaded from the database
+def on_follow(follower, followed):
+    if not followed.is_high_fanout:
+        _link(follower.id, followed.id, 'follows_author')
+    _link(followed.id, follower.id, 'followed_by_author')
+
+
+# Prune both timelines touched by an unfollow
+def on_unfollow(follower_id, followed_id):
+    _unlink(follower_id, followed_id, 'follows_author')
+    _unlink(followed_id, follower_id, 'followed_by_author')
+
+
+class MergedFeed:
+    """
+    Pushed timeline entries merged with posts pulled from high-fanout authors, paginated by
+    CursorPagination. Each page applies the cursor and a limit to both sources before merging them, so
+    it reads about one page of rows from each however deep it is.
+    """
+    model = Post
+    pushed_fields = ('created_at', 'post_id')
+    pulled_fields = ('created_at', 'id')
+
+    def __init__(self, pushed, pulled_author_ids, hidden_ids):
+        pulled = Post.objects.filter(user_id__in=pulled_author_ids)
+        # Timelines keep posts of blocked users; they are dropped when the feed is read
+        if hidden_ids:
+            pushed = pushed.exclude(post__user_id__in=hidden_ids).exclude(post__original_post__user_id__in=hidden_ids)
+            pulled = pulled.exclude_authors(hidden_ids)
+        self.pushed, self.pulled = pushed, pulled
+
+    def keyset_page(self, fields, descending, position, lookup, limit):
+        assert tuple(fields) == self.pulled_fields, 'Feeds are ordered by (created_at, id).'
+        sources = []
+        for queryset, source_fields in ((self.pushed, self.pushed_fields), (self.pulled, self.pulled_fields)):
+            if position is not None:
+                queryset = queryset.filter(keyset_filter(source_fields, position, lookup))
+            ordering = [f'-{field}' if descending else field for field in source_fields]
+            sources.append(queryset.order_by(*ordering).values_list(*source_fields)[:limit])
+
+        # Both sources are already sorted, so a k-way merge keeps the page sorted
+        merged = heapq.merge(*sources, reverse=descending)
+        # Posts written before their author switched to pull can come from both sources
+        post_ids = list(islice(dict.fromkeys(post_id for _, post_id in merged), limit))
+        posts = Post.objects.with_author().in_bulk(post_ids)
+        return [posts[post_id] for post_id in post_ids]
+
+
+# Posts of the people a user follows, newest first
+def following_feed(user):
+    pushed = TimelineEntry.objects.filter(owner=user, follows_author=True)
+    pulled_author_ids = list(
+        Follow.objects.filter(follower=user, followed__is_high_fanout=True).values_list('followed_id', flat=True)
+    )
+    return MergedFeed(pushed, pulled_author_ids, hidden_user_ids(user))
+
+
+# Posts of the people a user follows and of the people following them, newest first
+def friends_feed(user):
+    pushed = TimelineEntry.objects.filter(owner=user)
+    pulled_author_ids = list(
+        Follow.objects.filter(follower=user, followed__is_high_fanout=True).values_list('followed_id', flat=True)
+    )
+    return MergedFeed(pushed, pulled_author_ids, hidden_user_ids(user))
+
+
+# Delete the entries past TIMELINE_MAX_LENGTH from every timeline that has grown beyond it, oldest
+# first. Fan-out only ever adds entries, so this runs periodically (`manage.py prune_timelines`).
+def trim_timelines(batch_size=FANOUT_BATCH_SIZE):
+    max_length = settings.TIMELINE_MAX_LENGTH
+    owner_ids = list(
+        TimelineEntry.objects.values('owner_id').annotate(length=Count('id')).filter(length__gt=max_length)
+        .order_by('owner_id').values_list('owner_id', flat=True)
+    )
+    trimmed = 0
+    for start in range(0, len(owner_ids), batch_size):
+        overflow = list(
+            TimelineEntry.objects.filter(owner_id__in=owner_ids[start:start + batch_size])
+            .annotate(position=Window(RowNumber(), partition_by=[F('owner_id')], order_by=[F('created_at').desc(), F('post_id').desc()]))
+            .filter(position__gt=max_length)
+            .values_list('id', flat=True)
+        )
+        for chunk in range(0, len(overflow), batch_size):
+            trimmed += TimelineEntry.objects.filter(id__in=overflow[chunk:chunk + batch_size]).delete()[0]
+    return trimmed
+
+
+# Rebuild timelines from the follow graph, for data loaded without signals (fixtures, generators).
+# Each owner gets the latest TIMELINE_BACKFILL_SIZE posts of every author they are linked to.
+def rebuild_timelines(batch_size=FANOUT_BATCH_SIZE):
+    rebuilt = 0
+    last_id = 0
+    while True:
+        owner_ids = list(CustomUser.objects.filter(pk__gt=last_id).order_by('pk').values_list('id', flat=True)[:batch_size])
+        if not owner_ids:
+            return rebuilt
+        last_id = owner_ids[-1]
+
+        # (owner, author) -> reason, mirroring on_follow
+        links = {}
+        followed = Follow.objects.filter(follower_id__in=owner_ids, followed__is_high_fanout=False)
+        for owner_id, author_id in followed.values_list('follower_id', 'followed_id'):
+            links.setdefault((owner_id, author_id), set()).add('follows_author')
+        for author_id, owner_id in Follow.objects.filter(followed_id__in=owner_ids).values_list('follower_id', 'followed_id'):
+            links.setdefault((owner_id, author_id), set()).add('followed_by_author')
+
+        recent_posts = {}
+        author_ids = {author_id for _, author_id in links}
+        ranked = (
+            Post.objects.filter(user_id__in=author_ids)
+            .annotate(recency=Window(RowNumber(), partition_by=[F('user_id')], order_by=[F('created_at').desc(), F('id').desc()]))
+            .filter(recency__lte=settings.TIMELINE_BACKFILL_SIZE)
+            .values_list('user_id', 'id', 'created_at')
+        )
+        for author_id, post_id, created_at in ranked:
+            recent_posts.setdefault(author_id, []).append((post_id, created_at))
+
+        entries = [
+            TimelineEntry(owner_id=owner_id, post_id=post_id, created_at=created_at, **{reason: True for reason in reasons})
+            for (owner_id, author_id), reasons in links.items()
+            for post_id, created_at in recent_posts.get(author_id, ())
+        ]
+        with transaction.atomic():
+            TimelineEntry.objects.filter(owner_id__in=owner_ids).delete()
+            TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE)
+        rebuilt += len(owner_ids)
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Image derivatives for post and story images.
+#
+# Each uploaded image is resized to every IMAGE_VARIANT_SIZES entry (longest edge, never upscaled)
+# and encoded as WebP and JPEG next to the original, under a variants/ subdirectory. Encoding runs on
+# a thread pool after the upload's transaction commits, so the create request doesn't wait for it;
+# until the variants exist the serializers only expose the original.
+#
+# `image_variants` records {"source": original name, "sizes": {size: {"width", "height", "webp", "jpeg"}}};
+# variants whose source no longer matches the image are stale and are regenerated.
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def variants_are_current(instance):
+    return bool(instance.image) and instance.image_variants.get('source') == instance.image.name
+
+
+def variant_names(variants):
+    return [entry[extension] for entry in variants.get('sizes', {}).values() for extension in FORMATS]
+
+
+def render_variants(image_file):
+    """Write every size and format of `image_file` to storage and return the `sizes` map."""
+    with image_file.open('rb'), Image.open(image_file) as original:
+        original = ImageOps.exif_transpose(original)
+        directory, filename = os.path.split(image_file.name)
+        stem = os.path.splitext(filename)[0]
+
+        sizes = {}
+        for size, longest_edge in settings.IMAGE_VARIANT_SIZES.items():
+            resized = original.copy()
+            resized.thumbnail((longest_edge, longest_edge), Image.LANCZOS)
+            entry = {'width': resized.width, 'height': resized.height}
+            for extension, image_format in FORMATS.items():
+                # JPEG has no alpha channel or palette
+                encoded = resized if image_format == 'WEBP' or resized.mode == 'RGB' else resized.convert('RGB')
+                buffer = BytesIO()
+                encoded.save(buffer, image_format, quality=settings.IMAGE_VARIANT_QUALITY)
+                name = os.path.join(directory, 'variants', f'{stem}_{size}.{extension}')
+                entry[extension] = image_file.storage.save(name, ContentFile(buffer.getvalue()))
+            sizes[size] = entry
+    return sizes
+
+
+def generate_variants(model_label, pk):
+    """Render the variants for one Post or Story and store them on the row."""
+    from profiles import media  # profiles.media imports this module
+    try:
+        return store_variants(apps.get_model(model_label), pk)
+    finally:
+        # Variants written for an image that was replaced meanwhile have no row to take them over
+        media.release_claims()
+
+
+def store_variants(model, pk):
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image or variants_are_current(instance):
+        return False
+
+    source = instance.image.name
+    try:
+        sizes = render_variants(instance.image)
+    except (OSError, Image.DecompressionBombError):
+        logger.exception('Could not render image variants for %s %s', model._meta.label, pk)
+        return False
+
+    # The image may have been replaced while this one was encoding
+    if not model.objects.filter(pk=pk, image=source).exists():
+        return False
+    instance.image_variants = {'source': source, 'sizes': sizes}
+    # post_save invalidates the cached responses and releases the previous variants' files
+    instance.save(update_fields=['image_variants', 'updated_at'])
+    return True
+
+
+# Runs `generate_variants` on a lazily created thread pool, or inline when IMAGE_VARIANT_WORKERS is 0
+class ImageVariantPool:
+    def __init__(self):
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants',
+                )
+            return self.executor
+
+    def schedule(self, instance):
+        if not instance.image or variants_are_current(instance):
+            return
+        model_label, pk = instance._meta.label, instance.pk
+        # The worker must see the committed row and file
+        transaction.on_commit(lambda: self.submit(model_label, pk))
+
+    def submit(self, model_label, pk):
+        if settings.IMAGE_VARIANT_WORKERS <= 0:
+            return generate_variants(model_label, pk)
+        return self.get_executor().submit(self.run, model_label, pk)
+
+    def run(self, model_label, pk):
+        try:
+            return generate_variants(model_label, pk)
+        except Exception:
+            logger.exception('Image variant job failed for %s %s', model_label, pk)
+            return False
+        finally:
+            # Worker threads get their own connections and sit idle between jobs; close_old_connections()
+            # would keep them open for CONN_MAX_AGE
+            connection.close()
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+image_variant_pool = ImageVariantPool()
+
+
+def size_map(image, variants, build_url=None):
+    """
+    The image URLs a client can choose from: always the original, plus every derivative size once
+    it has been rendered for the current image. None when there is no image.
+    """
+    if not image:
+        return None
+    build_url = build_url or (lambda url: url)
+    images = {'original': build_url(image.url)}
+    if variants.get('source') == image.name:
+        for size, entry in variants.get('sizes', {}).items():
+            images[size] = {
+                'width': entry['width'],
+                'height': entry['height'],
+                **{extension: build_url(image.storage.url(entry[extension])) for extension in FORMATS},
+            }
+    return images
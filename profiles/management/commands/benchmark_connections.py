@@ -0,0 +1,60 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from profiles.db_metrics import connection_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request connections with persistent ones by running simulated requests '
+        '(request start, one query, request end) against a database alias.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--query', default='SELECT 1')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        configured = connection.settings_dict['CONN_MAX_AGE']
+        modes = [('per-request', 0), ('persistent', configured if configured else None)]
+
+        try:
+            for label, max_age in modes:
+                results = self.run(connection, max_age, options['iterations'], options['query'])
+                self.stdout.write(
+                    f"{label:<12} CONN_MAX_AGE={max_age!s:<5} "
+                    f"mean={results['mean']:.3f}ms p50={results['p50']:.3f}ms p95={results['p95']:.3f}ms "
+                    f"connections={results['connections']}"
+                )
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = configured
+
+    def run(self, connection, max_age, iterations, query):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        opened_before = connection_stats.snapshot()['aliases'][connection.alias]['connections_opened']
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            # The same signals a request fires; Django closes obsolete connections on both
+            request_started.send(sender=self.__class__)
+            with connection.cursor() as cursor:
+                cursor.execute(query)
+                cursor.fetchall()
+            request_finished.send(sender=self.__class__)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        opened = connection_stats.snapshot()['aliases'][connection.alias]['connections_opened'] - opened_before
+        return {
+            'mean': statistics.fmean(timings),
+            'p50': timings[len(timings) // 2],
+            'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            'connections': opened,
+        }
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from profiles import media
+from profiles.models import Post, Story
+from profiles.storage import BLOB_DIRECTORY
+
+
+class Command(BaseCommand):
+    help = (
+        'Move post and story images saved before content-addressed storage, and their variants, into it. '
+        'Duplicate files collapse into one blob, and the legacy copies are deleted once nothing references them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stored_names = {}
+        moved = missing = 0
+        for model in (Post, Story):
+            last_id = 0
+            while True:
+                rows = list(
+                    model.objects.filter(pk__gt=last_id).exclude(image='').exclude(image__isnull=True)
+                    .exclude(image__startswith=f'{BLOB_DIRECTORY}/').order_by('pk')[:batch_size]
+                )
+                if not rows:
+                    break
+                for instance in rows:
+                    if media.rehome(instance, stored_names):
+                        moved += 1
+                    else:
+                        missing += 1
+                last_id = rows[-1].pk
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} image(s): {len(stored_names)} legacy file(s) now share {len(set(stored_names.values()))} blob(s); '
+            f'{missing} image(s) had missing files.'
+        ))
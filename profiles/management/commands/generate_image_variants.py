@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from profiles.images import generate_variants
+from profiles.models import Post, Story
+
+
+class Command(BaseCommand):
+    help = 'Render the thumb/feed/full derivatives of post and story images that do not have current ones yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rendered = 0
+        for model in (Post, Story):
+            last_id = 0
+            while True:
+                ids = list(
+                    model.objects.filter(pk__gt=last_id).exclude(image='').exclude(image__isnull=True)
+                    .order_by('pk').values_list('pk', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                # generate_variants skips rows whose variants already match their image
+                rendered += sum(generate_variants(model._meta.label, pk) for pk in ids)
+                last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Rendered variants for {rendered} image(s).'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from profiles.social_graph import INSERT_BATCH_SIZE, SocialGraphGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Add synthetic users with a power-law follow graph, posts, likes, favorites, comments, stories and '
+        'story views, then rebuild counters, the search index and timelines.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--follows-per-user', type=float, default=20)
+        parser.add_argument('--posts-per-user', type=float, default=5)
+        parser.add_argument('--likes-per-post', type=float, default=3)
+        parser.add_argument('--comments-per-post', type=float, default=1)
+        parser.add_argument('--story-ratio', type=float, default=0.3, help='Share of users with an active story.')
+        parser.add_argument('--views-per-story', type=float, default=5)
+        parser.add_argument('--zipf-exponent', type=float, default=0.8, help='Higher values concentrate popularity.')
+        parser.add_argument('--days', type=int, default=30, help='Posts are spread over this many days.')
+        parser.add_argument('--password', default='password123', help='Password shared by every generated user.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=INSERT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        generator = SocialGraphGenerator(
+            users=options['users'],
+            follows_per_user=options['follows_per_user'],
+            posts_per_user=options['posts_per_user'],
+            likes_per_post=options['likes_per_post'],
+            comments_per_post=options['comments_per_post'],
+            story_ratio=options['story_ratio'],
+            views_per_story=options['views_per_story'],
+            zipf_exponent=options['zipf_exponent'],
+            days=options['days'],
+            password=options['password'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        created = generator.generate()
+        self.stdout.write(self.style.SUCCESS(f'Generated {created} user(s).'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from profiles.feed import FANOUT_BATCH_SIZE, trim_timelines
+
+
+class Command(BaseCommand):
+    help = 'Delete timeline entries past TIMELINE_MAX_LENGTH in every timeline. Run periodically, e.g. from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=FANOUT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        trimmed = trim_timelines(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {trimmed} timeline entries.'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from profiles.models import MediaBlob, Story, StoryView
+from profiles.media import media_names
+
+
+class Command(BaseCommand):
+    help = 'Delete expired stories, their views and their images in bounded batches. Run periodically, e.g. from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        max_batches = options['max_batches']
+        stories_deleted = views_deleted = images_deleted = batches = 0
+
+        while max_batches is None or batches < max_batches:
+            expired = list(Story.objects.expired().order_by('created_at').values_list('id', 'image', 'image_variants')[:batch_size])
+            if not expired:
+                break
+            story_ids = [story_id for story_id, _, _ in expired]
+            names = set().union(*(media_names(image, variants) for _, image, variants in expired))
+
+            with transaction.atomic():
+                views_deleted += StoryView.objects.filter(story_id__in=story_ids).delete()[0]
+                # Deleting through the ORM sends post_delete, which keeps share counters in step
+                stories_deleted += Story.objects.filter(id__in=story_ids).delete()[1].get(Story._meta.label, 0)
+
+            # post_delete released each story's media; files nothing else references are gone once committed
+            images_deleted += len(names) - MediaBlob.objects.filter(name__in=names).count()
+            batches += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {stories_deleted} expired stories, {views_deleted} story views and {images_deleted} images.'
+        ))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from profiles.models import MediaUpload
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete chunked uploads older than MEDIA_UPLOAD_TTL_HOURS that were never attached to a post or story, '
+        'with their temporary files and stored images. Run periodically, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.MEDIA_UPLOAD_TTL_HOURS)
+        deleted = 0
+        while True:
+            ids = list(MediaUpload.objects.filter(created_at__lte=cutoff).order_by('created_at').values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            # Deleting through the ORM sends post_delete, which removes the files
+            deleted += MediaUpload.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} stale upload(s).'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from profiles.counters import RECONCILE_BATCH_SIZE, reconcile_follow_counts, reconcile_post_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized counters from the source tables and fix any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_follow_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed follow counts for {fixed} user(s).'))
+        fixed = reconcile_post_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed engagement counts for {fixed} post(s).'))
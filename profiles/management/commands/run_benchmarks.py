@@ -0,0 +1,68 @@
+import json
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from profiles.benchmarks import BenchmarkRunner, compare
+from profiles.models import CustomUser
+from profiles.social_graph import GENERATED_USERNAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency, query count and peak memory of every profiles endpoint, write the results as JSON '
+        'and optionally compare them against a baseline file. With --scales, generated users are topped up '
+        'to each scale in turn before it is measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', help='Generated user counts to measure at, e.g. 1000 100000 1000000.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--endpoints', nargs='+', help='Only measure these URL names.')
+        parser.add_argument('--password', default='password123', help='Password of the generated users, for login.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--baseline', help='A previous results file to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown, as a fraction.')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(iterations=options['iterations'], password=options['password'], names=options['endpoints'])
+        results = {}
+        for scale in sorted(options['scales'] or [None]):
+            if scale is not None:
+                self.top_up(scale, options)
+            label = str(scale if scale is not None else CustomUser.objects.count())
+            self.stdout.write(f'Measuring at {label} users...')
+            results[label] = runner.run()
+            for endpoint, result in results[label].items():
+                self.stdout.write(
+                    f"  {endpoint:<45} {result['status']} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                    f"queries={result['queries']} peak={result['peak_memory_kb']}KB"
+                )
+
+        with open(options['output'], 'w') as output:
+            json.dump({
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'results': results,
+            }, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)['results']
+            regressions = compare(results, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(f'Regression: {regression}'))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+            elif options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regression(s) against the baseline.')
+
+    def top_up(self, scale, options):
+        generated = CustomUser.objects.filter(username__startswith=GENERATED_USERNAME_PREFIX).count()
+        if generated < scale:
+            call_command('generate_social_graph', users=scale - generated, password=options['password'],
+                         seed=options['seed'], stdout=self.stdout)
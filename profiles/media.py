@@ -0,0 +1,135 @@
+import threading
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from profiles.images import FORMATS, variant_names, variants_are_current
+from profiles.models import MediaBlob, Post
+
+# Reference counts for stored media. Every Post and Story references its image and each of its image
+# variants; a MediaBlob row counts those references per file name. Reshares and identical uploads
+# point at the same content-addressed file (profiles.storage), and the file is deleted once the last
+# row that references it is deleted or moves to another image.
+#
+# The storage claims a reference before it looks for an existing file (see claim()), and
+# collect_garbage re-checks a blob under a row lock before deleting it. A blob that is being collected
+# is therefore either kept, or deleted before the storage looks and written again.
+
+# Claims this thread's storage saves took that no row has taken over yet
+_claims = threading.local()
+
+
+def media_names(image_name, variants):
+    names = {image_name} if image_name else set()
+    return names | set(variant_names(variants or {}))
+
+
+def instance_media_names(instance):
+    return media_names(instance.image.name if instance.image else None, instance.image_variants)
+
+
+def stored_media_names(instance):
+    """The names the row currently references in the database, before an update is written."""
+    row = type(instance).objects.filter(pk=instance.pk).values_list('image', 'image_variants').first()
+    return media_names(*row) if row else set()
+
+
+def pending_claims():
+    if not hasattr(_claims, 'names'):
+        _claims.names = Counter()
+    return _claims.names
+
+
+def _increment(names):
+    names = set(names)
+    while names:
+        try:
+            with transaction.atomic():
+                # The rows stay locked until the increment commits, so collect_garbage can't delete them meanwhile
+                existing = set(MediaBlob.objects.select_for_update().filter(name__in=names).values_list('name', flat=True))
+                MediaBlob.objects.filter(name__in=existing).update(ref_count=F('ref_count') + 1)
+                MediaBlob.objects.bulk_create([MediaBlob(name=name, ref_count=1) for name in names - existing])
+            return
+        except IntegrityError:
+            pass  # Another request created one of the rows first; count on it instead
+
+
+def claim(name):
+    """Reference a file the storage is about to reuse or write; the next acquire() of it in this thread takes it over."""
+    _increment({name})
+    pending_claims()[name] += 1
+
+
+def acquire(names):
+    claims = pending_claims()
+    claimed = {name for name in names if claims[name] > 0}
+    claims.subtract(claimed)
+    _increment(set(names) - claimed)
+
+
+def release_claims():
+    """Release the claims no row took over, e.g. of a save that failed; run at the end of each request and job."""
+    claims = pending_claims()
+    while +claims:
+        names = set(+claims)
+        claims.subtract(names)
+        release(names)
+    claims.clear()
+
+
+def release(names):
+    if not names:
+        return
+    MediaBlob.objects.filter(name__in=names, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    # Files are only removed once the rows that stopped referencing them are committed
+    transaction.on_commit(lambda: collect_garbage(names))
+
+
+def collect_garbage(names=None):
+    """Delete unreferenced blobs (all of them, or only among `names`) and their files."""
+    storage = Post._meta.get_field('image').storage
+    orphans = MediaBlob.objects.filter(ref_count=0)
+    if names is not None:
+        orphans = orphans.filter(name__in=names)
+
+    deleted = 0
+    for blob_id, name in orphans.values_list('id', 'name'):
+        with transaction.atomic():
+            # Locked against acquire(); the blob may have been referenced again since it was released
+            if not MediaBlob.objects.select_for_update().filter(pk=blob_id, ref_count=0).exists():
+                continue
+            storage.delete(name)
+            MediaBlob.objects.filter(pk=blob_id).delete()
+        deleted += 1
+    return deleted
+
+
+def rehome(instance, stored_names):
+    """
+    Move a row's image and variants saved before content-addressed storage into it, so duplicate legacy
+    files collapse into one blob; the legacy files are collected once no row references them.
+    `stored_names` maps legacy names to stored ones across calls, so each legacy file is read once.
+    Returns False when a file is missing.
+    """
+    storage = instance.image.storage
+
+    def stored_name(name):
+        if name not in stored_names:
+            with storage.open(name, 'rb') as legacy:
+                stored_names[name] = storage.save(name, legacy)
+        return stored_names[name]
+
+    try:
+        image = stored_name(instance.image.name)
+        variants = {}
+        if variants_are_current(instance):
+            variants = {'source': image, 'sizes': {
+                size: {**entry, **{extension: stored_name(entry[extension]) for extension in FORMATS}}
+                for size, entry in instance.image_variants['sizes'].items()
+            }}
+        instance.image, instance.image_variants = image, variants
+        instance.save(update_fields=['image', 'image_variants', 'updated_at'])
+        return True
+    except FileNotFoundError:
+        return False
+    finally:
+        release_claims()  # Of names an earlier row already took over
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+BACKFILL_SIZE = 50
+
+
+def backfill_timelines(apps, schema_editor):
+    Follow = apps.get_model('profiles', 'Follow')
+    Post = apps.get_model('profiles', 'Post')
+    TimelineEntry = apps.get_model('profiles', 'TimelineEntry')
+
+    for follower_id, followed_id in Follow.objects.values_list('follower_id', 'followed_id').iterator():
+        recent_posts = Post.objects.filter(user_id=followed_id).order_by('-created_at').values_list('id', 'created_at')[:BACKFILL_SIZE]
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(owner_id=follower_id, post_id=post_id, created_at=created_at)
+            for post_id, created_at in recent_posts
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0010_rename_content_story_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='profiles.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_recent_idx')],
+                'unique_together': {('owner', 'post')},
+            },
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
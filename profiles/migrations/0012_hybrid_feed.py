@@ -0,0 +1,50 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:13
+
+from django.db import migrations, models
+
+
+BACKFILL_SIZE = 50
+
+
+# Existing timeline rows all came from following; add the posts of each user's followers
+def backfill_follower_posts(apps, schema_editor):
+    Follow = apps.get_model('profiles', 'Follow')
+    Post = apps.get_model('profiles', 'Post')
+    TimelineEntry = apps.get_model('profiles', 'TimelineEntry')
+
+    TimelineEntry.objects.update(follows_author=True)
+
+    for follower_id, followed_id in Follow.objects.values_list('follower_id', 'followed_id').iterator():
+        recent_posts = Post.objects.filter(user_id=follower_id).order_by('-created_at').values_list('id', 'created_at')[:BACKFILL_SIZE]
+        post_ids = [post_id for post_id, _ in recent_posts]
+        TimelineEntry.objects.filter(owner_id=followed_id, post_id__in=post_ids).update(followed_by_author=True)
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(owner_id=followed_id, post_id=post_id, created_at=created_at, follows_author=False, followed_by_author=True)
+            for post_id, created_at in recent_posts
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0011_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='is_high_fanout',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='followed_by_author',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='follows_author',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_follower_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:15
+
+from django.db import migrations, models
+
+
+def populate_follow_counts(apps, schema_editor):
+    CustomUser = apps.get_model('profiles', 'CustomUser')
+    Follow = apps.get_model('profiles', 'Follow')
+
+    follower_counts = dict(Follow.objects.values_list('followed_id').annotate(total=models.Count('id')).order_by())
+    following_counts = dict(Follow.objects.values_list('follower_id').annotate(total=models.Count('id')).order_by())
+    for user_id in set(follower_counts) | set(following_counts):
+        CustomUser.objects.filter(pk=user_id).update(
+            follower_count=follower_counts.get(user_id, 0),
+            following_count=following_counts.get(user_id, 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0012_hybrid_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_follow_counts, migrations.RunPython.noop),
+    ]
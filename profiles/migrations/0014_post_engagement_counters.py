@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:16
+
+from django.db import migrations, models
+
+
+def populate_post_counts(apps, schema_editor):
+    Post = apps.get_model('profiles', 'Post')
+    sources = (
+        ('like_count', apps.get_model('profiles', 'Like'), 'post_id'),
+        ('comment_count', apps.get_model('profiles', 'Comment'), 'post_id'),
+        ('favorite_count', apps.get_model('profiles', 'Favorite'), 'post_id'),
+        ('share_count', apps.get_model('profiles', 'Story'), 'shared_post_id'),
+    )
+    for field, model, group_by in sources:
+        totals = model.objects.exclude(**{group_by: None}).values_list(group_by).annotate(total=models.Count('id')).order_by()
+        for post_id, total in totals:
+            Post.objects.filter(pk=post_id).update(**{field: total})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0013_follow_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='share_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_post_counts, migrations.RunPython.noop),
+    ]
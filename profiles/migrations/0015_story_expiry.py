@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0014_post_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['created_at'], name='story_created_at_idx'),
+        ),
+    ]
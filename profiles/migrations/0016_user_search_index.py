@@ -0,0 +1,73 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:24
+
+import unicodedata
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Copied from profiles.search as it was when this migration was written, so later changes to the
+# search module can't change what this migration does
+MAX_TERM_LENGTH = 32
+USERNAME_WEIGHT = 3
+FULLNAME_WEIGHT = 2
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def search_terms(username, fullname):
+    terms = {}
+
+    def add(kind, term, weight):
+        key = (kind, term)
+        terms[key] = max(terms.get(key, 0), weight)
+
+    username = normalize(username)
+    fullname = normalize(fullname)
+    for text, weight in ((username, USERNAME_WEIGHT), (fullname, FULLNAME_WEIGHT)):
+        for source in {text, *text.split()}:
+            for end in range(1, min(len(source), MAX_TERM_LENGTH) + 1):
+                add('p', source[:end], weight)
+        for word in text.split():
+            for index in range(len(word) - 2):
+                add('t', word[index:index + 3], 0)
+    return terms
+
+
+def index_users(apps, schema_editor):
+    CustomUser = apps.get_model('profiles', 'CustomUser')
+    UserSearchTerm = apps.get_model('profiles', 'UserSearchTerm')
+
+    for user_id, username, fullname in CustomUser.objects.values_list('id', 'username', 'fullname').iterator():
+        UserSearchTerm.objects.bulk_create([
+            UserSearchTerm(user_id=user_id, kind=kind, term=term, weight=weight)
+            for (kind, term), weight in search_terms(username, fullname).items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0015_story_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('p', 'Prefix'), ('t', 'Trigram')], max_length=1)),
+                ('term', models.CharField(max_length=32)),
+                ('weight', models.PositiveSmallIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'term', 'user'], name='user_search_term_idx')],
+                'unique_together': {('user', 'kind', 'term')},
+            },
+        ),
+        migrations.RunPython(index_users, migrations.RunPython.noop),
+    ]
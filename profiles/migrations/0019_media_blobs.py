@@ -0,0 +1,40 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:45
+
+from collections import Counter
+from django.db import migrations, models
+
+
+# Copied from profiles.media and profiles.images as they were when this migration was written
+def media_names(image_name, variants):
+    names = {image_name} if image_name else set()
+    return names | {entry[extension] for entry in (variants or {}).get('sizes', {}).values() for extension in ('webp', 'jpeg')}
+
+
+def count_existing_references(apps, schema_editor):
+    MediaBlob = apps.get_model('profiles', 'MediaBlob')
+    references = Counter()
+    for model_name in ('Post', 'Story'):
+        model = apps.get_model('profiles', model_name)
+        for image, variants in model.objects.exclude(image='').exclude(image__isnull=True).values_list('image', 'image_variants').iterator():
+            references.update(media_names(image, variants))
+    MediaBlob.objects.bulk_create([MediaBlob(name=name, ref_count=count) for name, count in references.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0018_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0019_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='caption',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='original_post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reshares', to='profiles.post'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-17 23:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def start_from_created_at(apps, schema_editor):
+    for model_name in ('Post', 'Story'):
+        apps.get_model('profiles', model_name).objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0021_media_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(start_from_created_at, migrations.RunPython.noop),
+    ]
@@ -5,3 +5,6 @@ from .likes_comments import Like, Comment
 from .favourites import Favorite
 from .block import Block
 from .story import Story, StoryView
+from .timeline import TimelineEntry
+from .search import UserSearchTerm
+from .media import MediaBlob, MediaUpload
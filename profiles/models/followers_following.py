@@ -7,6 +7,10 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('follower', 'followed')
+        indexes = [
+            # A user's followers; the unique constraint only covers lookups by follower
+            models.Index(fields=['followed', 'follower'], name='follow_followed_follower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.follower} follows {self.followed}"
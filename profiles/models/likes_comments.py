@@ -17,5 +17,11 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # A post's comments in conversation order
+            models.Index(fields=['post', 'created_at'], name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.content
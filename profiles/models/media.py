@@ -0,0 +1,34 @@
+import uuid
+from django.conf import settings
+from django.db import models
+
+# One stored media file and how many Post/Story images or image variants point at it
+class MediaBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+# A chunked, resumable upload. Chunks are appended to a temporary file until `received` reaches `size`;
+# completing it moves the file into media storage as `blob_name`, ready to attach to a post or story.
+class MediaUpload(models.Model):
+    PENDING = 'pending'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (COMPLETE, 'Complete')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='media_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=PENDING)
+    blob_name = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Stale uploads, oldest first
+            models.Index(fields=['created_at'], name='media_upload_created_at_idx'),
+        ]
@@ -1,12 +1,52 @@
 from django.db import models
 from django.conf import settings
 
+class PostQuerySet(models.QuerySet):
+    # Join the author in the same query, loading only the columns the author summary needs. A reshare's
+    # original post and its author come from the same query.
+    def with_author(self):
+        post_fields = [field.attname for field in self.model._meta.concrete_fields]
+        return self.select_related('user', 'original_post__user').only(
+            *post_fields, 'user__username', 'user__fullname',
+            *[f'original_post__{field}' for field in post_fields],
+            'original_post__user__username', 'original_post__user__fullname',
+        )
+
+    # Posts by these users, and reshares of their posts
+    def exclude_authors(self, user_ids):
+        return self.exclude(user_id__in=user_ids).exclude(original_post__user_id__in=user_ids)
+
+    def engagement_target(self, post_id):
+        """The post that likes, comments and favorites on `post_id` count toward: the original of a reshare."""
+        post = self.select_related('original_post').get(id=post_id)
+        return post.original_post or post
+
 class Post(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=255, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Resized WebP/JPEG copies of the image, written by profiles.images
+    image_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Moves with every edit, including counter changes; the Last-Modified of conditional GETs
+    updated_at = models.DateTimeField(auto_now=True)
+    # Engagement counters, denormalized so feeds can show them without counting
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    favorite_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
+    # Set on reshares, which carry no content of their own besides the optional caption
+    original_post = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='reshares')
+    caption = models.TextField(blank=True, null=True)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # An author's posts, newest first: profiles and posts pulled into feeds
+            models.Index(fields=['user', '-created_at'], name='post_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.username} at {self.created_at}"
@@ -0,0 +1,30 @@
+from django.db import models
+from django.conf import settings
+
+MAX_TERM_LENGTH = 32
+
+# One normalized search key of a user: a prefix of their username or of their full name (or one of
+# its words), or a trigram of either. Maintained by profiles.search and rebuilt with
+# `manage.py rebuild_user_search_index`.
+class UserSearchTerm(models.Model):
+    PREFIX = 'p'
+    TRIGRAM = 't'
+    KIND_CHOICES = [
+        (PREFIX, 'Prefix'),
+        (TRIGRAM, 'Trigram'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='search_terms', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    term = models.CharField(max_length=MAX_TERM_LENGTH)
+    # How strongly a prefix hit ranks: username prefixes above full name prefixes
+    weight = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'kind', 'term')
+        indexes = [
+            models.Index(fields=['kind', 'term', 'user'], name='user_search_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term!r} ({self.get_kind_display()}) for {self.user_id}"
@@ -1,16 +1,46 @@
+from datetime import timedelta
 from django.db import models
-from social_media_backend import settings
+from django.utils import timezone
+from django.conf import settings
 from .posts import Post
 
 User = settings.AUTH_USER_MODEL
 
+class StoryQuerySet(models.QuerySet):
+    def expiry_cutoff(self):
+        return timezone.now() - timedelta(hours=settings.STORY_TTL_HOURS)
+
+    # Stories still inside their time-to-live
+    def active(self):
+        return self.filter(created_at__gt=self.expiry_cutoff())
+
+    def expired(self):
+        return self.filter(created_at__lte=self.expiry_cutoff())
+
 class Story(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stories')
     description = models.TextField()
     image = models.ImageField(upload_to='stories/', blank=True, null=True)
+    # Resized WebP/JPEG copies of the image, written by profiles.images
+    image_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Moves with every edit; the Last-Modified of conditional GETs
+    updated_at = models.DateTimeField(auto_now=True)
     shared_post = models.ForeignKey(Post, on_delete=models.SET_NULL, null=True, blank=True, related_name='shared_in_stories')
-    
+
+    objects = StoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='story_created_at_idx'),
+            # A friend's active stories
+            models.Index(fields=['user', '-created_at'], name='story_user_recent_idx'),
+        ]
+
+    @property
+    def is_expired(self):
+        return self.created_at <= Story.objects.expiry_cutoff()
+
 class StoryView(models.Model):
     story = models.ForeignKey(Story, related_name='views', on_delete=models.CASCADE)
     user = models.ForeignKey(User, related_name='viewed_stories', on_delete=models.CASCADE)
@@ -0,0 +1,22 @@
+from django.db import models
+from django.conf import settings
+from .posts import Post
+
+# A post id pushed into a user's home timeline when the post is written
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='timeline_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='timeline_entries', on_delete=models.CASCADE)
+    # Copied from the post so the timeline can be read in post order without a join
+    created_at = models.DateTimeField()
+    # Why the post is in this timeline: the owner follows its author, the author follows the owner, or both
+    follows_author = models.BooleanField(default=False)
+    followed_by_author = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('owner', 'post')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in timeline of {self.owner_id}"
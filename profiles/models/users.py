@@ -41,6 +41,11 @@ class CustomUser(AbstractBaseUser):
     otp = models.CharField(max_length=6, blank=True, null=True)
     is_active = models.BooleanField(default=True)
     is_admin = models.BooleanField(default=False)
+    # Set once an author outgrows fan-out-on-write; their posts are pulled into feeds at read time
+    is_high_fanout = models.BooleanField(default=False)
+    # Denormalized from Follow so profile headers never count the follow graph
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     objects = CustomUserManager()
 
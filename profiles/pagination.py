@@ -0,0 +1,121 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+def keyset_filter(fields, position, lookup):
+    """Rows strictly past `position` on `fields`, compared in order, with `lookup` ('lt' or 'gt')."""
+    condition = Q()
+    for index, field in enumerate(fields):
+        clause = Q(**{f'{field}__{lookup}': position[index]})
+        for previous_field, value in zip(fields[:index], position[:index]):
+            clause &= Q(**{previous_field: value})
+        condition |= clause
+    return condition
+
+
+# Keyset pagination: each page is fetched with a WHERE on the last seen (created_at, id) instead of an OFFSET,
+# so deep pages cost the same as the first one. Views choose their sort key with `cursor_ordering`.
+#
+# A source merged from several queries, such as a hybrid feed, can't take one WHERE and LIMIT; it
+# provides `keyset_page(fields, descending, position, lookup, limit)` and bounds each query itself.
+class CursorPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'cursor_ordering', self.ordering))
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        assert all(name.startswith('-') == self.descending for name in self.ordering), (
+            'CursorPagination needs every ordering field to sort in the same direction.'
+        )
+
+        position, reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+        # Walking backwards flips the comparison as well as the ordering
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        if hasattr(queryset, 'keyset_page'):
+            results = queryset.keyset_page(self.fields, self.descending != reverse, position, lookup, self.page_size + 1)
+        else:
+            queryset = queryset.order_by(*ordering)
+            if position is not None:
+                queryset = queryset.filter(keyset_filter(self.fields, position, lookup))
+            results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        page = results[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.next_position = self.previous_position = None
+        if page:
+            if reverse:
+                self.next_position = self.get_position(page[-1])
+                self.previous_position = self.get_position(page[0]) if has_more else None
+            else:
+                self.next_position = self.get_position(page[-1]) if has_more else None
+                self.previous_position = self.get_position(page[0]) if position is not None else None
+        return page
+
+    def get_position(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def encode_cursor(self, position, reverse=False):
+        values = [value.isoformat() if isinstance(value, (datetime, date)) else value for value in position]
+        payload = json.dumps({'p': values, 'r': reverse}, separators=(',', ':'))
+        cursor = urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = []
+            for field_name, value in zip(self.fields, values):
+                try:
+                    value = model._meta.get_field(field_name).to_python(value)
+                except FieldDoesNotExist:
+                    pass  # Annotations are compared as-is
+                position.append(value)
+            return position, bool(payload.get('r'))
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_links(self):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+
+    # Views wrap the page in their own envelope and add `get_links()` next to it
+    def get_paginated_response(self, data):
+        return Response(data)
@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+# Read-replica routing.
+#
+# Reads go to the replica only inside a safe request to a view marked with `use_read_replica`, and
+# only when a 'replica' alias is configured; everything else, and every write, uses 'default'. A user
+# who has just written is pinned to the primary for READ_REPLICA_STICKY_SECONDS so they read their own
+# writes despite replication lag, and a request that writes reads from the primary from then on. The
+# pin is kept in the 'shared' cache, so it holds whichever worker serves the user's next request.
+#
+# Data that fills a cache is read from the primary even inside a marked view: other users trust the
+# entry until it expires or is invalidated, long after a lagging replica would have caught up.
+
+REPLICA_ALIAS = 'replica'
+STICKY_CACHE_KEY = 'replica_sticky:{user_id}'
+# App label of the table behind Django's database cache backend
+CACHE_TABLE_APP_LABEL = 'django_cache'
+
+_reads_use_replica = ContextVar('reads_use_replica', default=False)
+_filling_cache = ContextVar('filling_cache', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def pin_to_primary(user):
+    if user is not None and user.is_authenticated:
+        caches['shared'].set(STICKY_CACHE_KEY.format(user_id=user.pk), True, settings.READ_REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user is not None and user.is_authenticated and bool(caches['shared'].get(STICKY_CACHE_KEY.format(user_id=user.pk)))
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # A database cache must see its own invalidations at once, so it never reads from the replica
+        if (_reads_use_replica.get() and not _filling_cache.get() and replica_configured()
+                and model._meta.app_label != CACHE_TABLE_APP_LABEL):
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Anything read after a write in the same request must see it; filling a cache entry is not a write
+        if model._meta.app_label != CACHE_TABLE_APP_LABEL:
+            _reads_use_replica.set(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+@contextmanager
+def reads_for_cache():
+    """Send the reads made inside the block to the primary, because their result is cached."""
+    token = _filling_cache.set(True)
+    try:
+        yield
+    finally:
+        _filling_cache.reset(token)
+
+
+def use_read_replica(view):
+    """
+    Mark a view (a DRF view class, or the function returned by `@api_view`) as safe to serve from the
+    replica. The decision is taken after authentication so the sticky window can be checked per user.
+    """
+    view_class = getattr(view, 'cls', view)
+    initial = view_class.initial
+    finalize_response = view_class.finalize_response
+
+    def initial_with_replica(self, request, *args, **kwargs):
+        initial(self, request, *args, **kwargs)
+        if not replica_configured():
+            return  # Everything is read from the primary; skip the pin lookup
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            self._replica_token = _reads_use_replica.set(True)
+
+    def finalize_response_with_replica(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _reads_use_replica.reset(token)
+            self._replica_token = None
+        return finalize_response(self, request, response, *args, **kwargs)
+
+    view_class.initial = initial_with_replica
+    view_class.finalize_response = finalize_response_with_replica
+    return view
+
+
+# Pins users to the primary after a successful write. DRF stores the authenticated user on the
+# underlying request, so it is available here once the view has run.
+class ReadReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replica_configured() and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(getattr(request, 'user', None))
+        return response
@@ -0,0 +1,125 @@
+import unicodedata
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from profiles.models import CustomUser, UserSearchTerm
+from profiles.models.search import MAX_TERM_LENGTH
+
+# User search over a normalized term table instead of `LIKE '%...%'` scans of the user table.
+#
+# Every user gets a row per prefix of their username, of their full name and of each word in it, and
+# a row per trigram of those words. A query is looked up as one exact prefix term, and queries of three
+# or more characters also match users that contain every trigram of the query, which finds matches in
+# the middle of a name. Both lookups are equality matches on the (kind, term) index.
+
+USERNAME_WEIGHT = 3
+FULLNAME_WEIGHT = 2
+# Ranks of matches that are not a prefix hit with a stored weight
+EXACT_USERNAME_RANK = 4
+TRIGRAM_RANK = 1
+
+INDEX_BATCH_SIZE = 1000
+
+
+def normalize(text):
+    # Case- and accent-insensitive, with runs of whitespace collapsed
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def trigrams(word):
+    return {word[index:index + 3] for index in range(len(word) - 2)}
+
+
+def search_terms(username, fullname):
+    """Return {(kind, term): weight} for a user's username and full name."""
+    terms = {}
+
+    def add(kind, term, weight):
+        key = (kind, term)
+        terms[key] = max(terms.get(key, 0), weight)
+
+    username = normalize(username)
+    fullname = normalize(fullname)
+    for text, weight in ((username, USERNAME_WEIGHT), (fullname, FULLNAME_WEIGHT)):
+        for source in {text, *text.split()}:
+            for end in range(1, min(len(source), MAX_TERM_LENGTH) + 1):
+                add(UserSearchTerm.PREFIX, source[:end], weight)
+        for word in text.split():
+            for gram in trigrams(word):
+                add(UserSearchTerm.TRIGRAM, gram, 0)
+    return terms
+
+
+# Bring one user's rows in line with their current names, touching only the rows that changed
+def index_user(user):
+    wanted = search_terms(user.username, user.fullname)
+    existing = {
+        (kind, term): (term_id, weight)
+        for term_id, kind, term, weight in UserSearchTerm.objects.filter(user=user).values_list('id', 'kind', 'term', 'weight')
+    }
+    stale = [term_id for key, (term_id, weight) in existing.items() if wanted.get(key) != weight]
+    added = [
+        UserSearchTerm(user=user, kind=kind, term=term, weight=weight)
+        for (kind, term), weight in wanted.items()
+        if existing.get((kind, term), (None, None))[1] != weight
+    ]
+    with transaction.atomic():
+        if stale:
+            UserSearchTerm.objects.filter(id__in=stale).delete()
+        UserSearchTerm.objects.bulk_create(added)
+
+
+def rebuild_search_index(batch_size=INDEX_BATCH_SIZE):
+    indexed = 0
+    last_id = 0
+    while True:
+        users = list(CustomUser.objects.filter(pk__gt=last_id).order_by('pk').values_list('id', 'username', 'fullname')[:batch_size])
+        if not users:
+            return indexed
+        last_id = users[-1][0]
+
+        rows = [
+            UserSearchTerm(user_id=user_id, kind=kind, term=term, weight=weight)
+            for user_id, username, fullname in users
+            for (kind, term), weight in search_terms(username, fullname).items()
+        ]
+        with transaction.atomic():
+            UserSearchTerm.objects.filter(user_id__in=[user[0] for user in users]).delete()
+            UserSearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+        indexed += len(users)
+
+
+def search_users(query):
+    """
+    Users matching `query`, annotated with `search_rank` (higher is better): an exact username, then
+    username prefixes, then full name prefixes, then trigram matches. Queries are matched on their
+    first MAX_TERM_LENGTH characters. Returns None for a query with nothing searchable in it.
+    """
+    query = normalize(query)[:MAX_TERM_LENGTH]
+    if not query:
+        return None
+
+    prefix_hits = UserSearchTerm.objects.filter(kind=UserSearchTerm.PREFIX, term=query)
+    matches = Q(id__in=prefix_hits.values('user_id'))
+
+    grams = set().union(*(trigrams(word) for word in query.split()))
+    if grams:
+        trigram_hits = (
+            UserSearchTerm.objects.filter(kind=UserSearchTerm.TRIGRAM, term__in=grams)
+            .values('user_id')
+            .annotate(matched=Count('id'))
+            .filter(matched=len(grams))
+            .values('user_id')
+        )
+        matches |= Q(id__in=trigram_hits)
+
+    prefix_weight = prefix_hits.filter(user=OuterRef('pk')).values('weight')[:1]
+    return CustomUser.objects.filter(matches).annotate(
+        search_rank=Case(
+            When(username__iexact=query, then=Value(EXACT_USERNAME_RANK)),
+            default=Coalesce(Subquery(prefix_weight), Value(TRIGRAM_RANK)),
+            output_field=IntegerField(),
+        )
+    )
@@ -1,3 +1,3 @@
 from .users import UserSerializer, SimpleUserSerializer, DetailedUserSerializer
 from .followers_following import FollowSerializer, UserFollowerCountSerializer, UserFollowingCountSerializer, FollowerWithUsernameSerializer, FollowingWithUsernameSerializer
-from .post_serializer import PostSerializer, TimelinePostSerializer
+from .post_serializer import PostSerializer
@@ -11,25 +11,17 @@ class FollowSerializer(serializers.ModelSerializer):
 
 # Custom configuration for getting followers count 
 class UserFollowerCountSerializer(serializers.ModelSerializer):
-    follower_count = serializers.SerializerMethodField()
-
     class Meta:
         model = CustomUser
         fields = ('username', 'fullname', 'follower_count')
+        read_only_fields = ('follower_count',)
 
-    def get_follower_count(self, obj):
-        return obj.followers.count()
-    
 # Custom configuration for getting following count
 class UserFollowingCountSerializer(serializers.ModelSerializer):
-    following_count = serializers.SerializerMethodField()
-
     class Meta:
         model = CustomUser
         fields = ('username', 'fullname', 'following_count')
-
-    def get_following_count(self, obj):
-        return obj.following.count()  # Using the 'following' related name
+        read_only_fields = ('following_count',)
 
 
 class FollowerWithUsernameSerializer(serializers.ModelSerializer):
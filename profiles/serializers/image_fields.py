@@ -0,0 +1,14 @@
+from rest_framework import serializers
+from profiles.images import size_map
+
+# The original image URL plus its thumb/feed/full derivatives, see profiles.images.size_map
+class ImageSizesField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request is not None else None
+        return size_map(instance.image, instance.image_variants, build_url)
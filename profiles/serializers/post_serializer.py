@@ -1,25 +1,102 @@
+from django.db.models import Value
 from rest_framework import serializers
-from profiles.models import Post
+from profiles.models import Post, Like, Favorite, CustomUser
+from .image_fields import ImageSizesField
+from .upload_fields import UploadAttachmentMixin
+
+# Which of the given posts the viewer has liked and favorited, resolved with a single UNION query
+def viewer_post_state(user, post_ids):
+    liked, favorited = set(), set()
+    if not user or not user.is_authenticated or not post_ids:
+        return liked, favorited
+
+    likes = Like.objects.filter(user=user, post_id__in=post_ids).annotate(kind=Value('like')).values_list('post_id', 'kind')
+    favorites = Favorite.objects.filter(user=user, post_id__in=post_ids).annotate(kind=Value('favorite')).values_list('post_id', 'kind')
+    for post_id, kind in likes.union(favorites, all=True):
+        (liked if kind == 'like' else favorited).add(post_id)
+    return liked, favorited
+
+# Reshares show the viewer's state on the original they point at
+def post_and_original_ids(posts):
+    return [post_id for post in posts for post_id in (post.id, post.original_post_id) if post_id is not None]
+
+# Resolves the viewer flags for a whole page up front instead of once per post
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        self.child.viewer_state = viewer_post_state(getattr(request, 'user', None), post_and_original_ids(posts))
+        return super().to_representation(posts)
+
+# Minimal author details embedded in each post so clients don't resolve user ids one by one
+class PostAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'username', 'fullname')
+
+# The post a reshare points at, with its own author and the authoritative engagement counters
+class OriginalPostSerializer(serializers.ModelSerializer):
+    author = PostAuthorSerializer(source='user', read_only=True)
+    images = ImageSizesField()
 
-class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
-        fields = ('id', 'user', 'title', 'description', 'image', 'created_at')
-        read_only_fields = ('user', 'created_at')
+        fields = ('id', 'user', 'author', 'title', 'description', 'image', 'images', 'created_at',
+                  'updated_at', 'like_count', 'comment_count', 'favorite_count', 'share_count')
+        read_only_fields = fields
 
-    def validate(self, data):
-        if not any([data.get('title'), data.get('description'), data.get('image')]):
-            raise serializers.ValidationError("At least one of title, description, or image must be provided.")
-        return data
+class PostSerializer(UploadAttachmentMixin, serializers.ModelSerializer):
+    author = PostAuthorSerializer(source='user', read_only=True)
+    images = ImageSizesField()
+    original_post = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
+    favorited_by_me = serializers.SerializerMethodField()
 
-class TimelinePostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
-        fields = ['id', 'user', 'title', 'description', 'image', 'created_at']
-        read_only_fields = ['user', 'created_at']
+        fields = ('id', 'user', 'author', 'title', 'description', 'image', 'upload_id', 'images', 'caption', 'original_post',
+                  'created_at', 'updated_at', 'like_count', 'comment_count', 'favorite_count', 'share_count',
+                  'liked_by_me', 'favorited_by_me')
+        read_only_fields = ('user', 'created_at', 'updated_at', 'like_count', 'comment_count', 'favorite_count', 'share_count')
+        list_serializer_class = PostListSerializer
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # A reshare's content is the original post; only its caption can change
+        if isinstance(self.instance, Post) and self.instance.original_post_id is not None:
+            for name in ('title', 'description', 'image'):
+                fields[name].read_only = True
+            del fields['upload_id']
+        return fields
+
+    def get_viewer_state(self, obj):
+        state = getattr(self, 'viewer_state', None)
+        if state is None or (self.parent is None and obj.id not in self.viewer_post_ids):
+            # Single post outside a list: look it up on its own
+            request = self.context.get('request')
+            state = self.viewer_state = viewer_post_state(getattr(request, 'user', None), post_and_original_ids([obj]))
+            self.viewer_post_ids = {obj.id}
+        return state
+
+    def get_original_post(self, obj):
+        if obj.original_post_id is None:
+            return None
+        data = OriginalPostSerializer(obj.original_post, context=self.context).data
+        liked, favorited = self.get_viewer_state(obj)
+        data['liked_by_me'] = obj.original_post_id in liked
+        data['favorited_by_me'] = obj.original_post_id in favorited
+        return data
+
+    def get_liked_by_me(self, obj):
+        return obj.id in self.get_viewer_state(obj)[0]
+
+    def get_favorited_by_me(self, obj):
+        return obj.id in self.get_viewer_state(obj)[1]
 
     def validate(self, data):
+        data = self.attach_upload(data)
+        if self.instance is not None and self.instance.original_post_id is not None:
+            return data
         if not any([data.get('title'), data.get('description'), data.get('image')]):
             raise serializers.ValidationError("At least one of title, description, or image must be provided.")
         return data
-
@@ -1,21 +1,34 @@
 # from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from profiles.models import Story, StoryView, Post
+from .image_fields import ImageSizesField
+from .upload_fields import UploadAttachmentMixin
 
 # User = get_user_model()
 
-class StorySerializer(serializers.ModelSerializer):
+class StorySerializer(UploadAttachmentMixin, serializers.ModelSerializer):
+    images = ImageSizesField()
+
     class Meta:
         model = Story
-        fields = ['id', 'user', 'description', 'image', 'created_at', 'shared_post']
-        read_only_fields = ['user', 'created_at']
+        fields = ['id', 'user', 'description', 'image', 'upload_id', 'images', 'created_at', 'updated_at', 'shared_post']
+        read_only_fields = ['user', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        return self.attach_upload(data)
+
+# A story inside the story tray, with whether the viewer has already seen it
+class TrayStorySerializer(serializers.ModelSerializer):
+    seen = serializers.BooleanField(read_only=True)
+    images = ImageSizesField()
+
+    class Meta:
+        model = Story
+        fields = ['id', 'description', 'image', 'images', 'created_at', 'shared_post', 'seen']
 
 class StoryViewSerializer(serializers.ModelSerializer):
-    username = serializers.SerializerMethodField()  # Add this field
+    username = serializers.CharField(source='user.username', read_only=True)  # Read from the joined user row
 
     class Meta:
         model = StoryView
-        fields = ['story', 'username', 'viewed_at']  # Exclude 'user' and only include required fields
-
-    def get_username(self, obj):
-        return obj.user.username  # Retrieve the username from the user object
\ No newline at end of file
+        fields = ['story', 'username', 'viewed_at']  # Exclude 'user' and only include required fields
\ No newline at end of file
@@ -0,0 +1,36 @@
+from rest_framework import serializers
+from profiles.uploads import completed_upload
+
+# Lets a post or story take its image from a completed chunked upload (profiles.uploads) instead of
+# a multipart file. The upload is deleted once the row holds the image.
+class UploadAttachmentMixin(serializers.Serializer):
+    upload_id = serializers.UUIDField(write_only=True, required=False)
+
+    def validate_upload_id(self, value):
+        upload = completed_upload(self.context['request'].user, value)
+        if upload is None:
+            raise serializers.ValidationError("Upload not found or not complete.")
+        return upload
+
+    def attach_upload(self, data):
+        upload = data.pop('upload_id', None)
+        if upload is not None:
+            if data.get('image'):
+                raise serializers.ValidationError("Provide either image or upload_id, not both.")
+            data['image'] = upload.blob_name
+            data['upload'] = upload
+        return data
+
+    def create(self, validated_data):
+        upload = validated_data.pop('upload', None)
+        instance = super().create(validated_data)
+        if upload is not None:
+            upload.delete()
+        return instance
+
+    def update(self, instance, validated_data):
+        upload = validated_data.pop('upload', None)
+        instance = super().update(instance, validated_data)
+        if upload is not None:
+            upload.delete()
+        return instance
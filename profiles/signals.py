@@ -0,0 +1,207 @@
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from profiles.models import CustomUser, Post, Follow, Like, Comment, Favorite, Block, Story, MediaUpload
+from profiles import feed, counters, cache, search, media, uploads
+from profiles.authentication import user_state_cache
+from profiles.story_tray import friend_ids, invalidate_story_trays
+from profiles.typeahead import username_index
+from profiles.blocks import invalidate_hidden_users
+from profiles.db_metrics import connection_stats
+from profiles.images import image_variant_pool
+
+ENGAGEMENT_COUNTERS = {
+    Like: 'like_count',
+    Comment: 'comment_count',
+    Favorite: 'favorite_count',
+}
+
+# Push new posts into followers' timelines
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out_post(instance)
+
+# Keep timelines in step with the follow graph
+@receiver(post_save, sender=Follow)
+def backfill_on_follow(sender, instance, created, **kwargs):
+    if created:
+        feed.on_follow(instance.follower, instance.followed)
+
+@receiver(post_delete, sender=Follow)
+def prune_on_unfollow(sender, instance, **kwargs):
+    feed.on_unfollow(instance.follower_id, instance.followed_id)
+
+# Follower/following counters
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust_follow_counts(instance.follower_id, instance.followed_id, 1)
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance, **kwargs):
+    counters.adjust_follow_counts(instance.follower_id, instance.followed_id, -1)
+
+# Per-post engagement counters
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Favorite)
+def count_engagement(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust_post_count(instance.post_id, ENGAGEMENT_COUNTERS[sender], 1)
+
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Favorite)
+def uncount_engagement(sender, instance, **kwargs):
+    counters.adjust_post_count(instance.post_id, ENGAGEMENT_COUNTERS[sender], -1)
+
+@receiver(post_save, sender=Story)
+def count_story_share(sender, instance, created, **kwargs):
+    if created and instance.shared_post_id:
+        counters.adjust_post_count(instance.shared_post_id, 'share_count', 1)
+
+@receiver(post_delete, sender=Story)
+def uncount_story_share(sender, instance, **kwargs):
+    if instance.shared_post_id:
+        counters.adjust_post_count(instance.shared_post_id, 'share_count', -1)
+
+@receiver(post_save, sender=Post)
+def count_reshare(sender, instance, created, **kwargs):
+    if created and instance.original_post_id:
+        counters.adjust_post_count(instance.original_post_id, 'share_count', 1)
+
+@receiver(post_delete, sender=Post)
+def uncount_reshare(sender, instance, **kwargs):
+    if instance.original_post_id:
+        counters.adjust_post_count(instance.original_post_id, 'share_count', -1)
+
+# Render thumb/feed/full derivatives of new or replaced images
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Story)
+def schedule_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'image' in update_fields:
+        image_variant_pool.schedule(instance)
+
+# Media reference counts: note what an updated row referenced before the write, then acquire the
+# names it gained and release the ones it dropped
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Story)
+def remember_media_names(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'image', 'image_variants'} & set(update_fields):
+        instance._stored_media_names = None
+    else:
+        instance._stored_media_names = set() if instance._state.adding else media.stored_media_names(instance)
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Story)
+def count_media_references(sender, instance, **kwargs):
+    before = getattr(instance, '_stored_media_names', None)
+    if before is None:
+        return
+    after = media.instance_media_names(instance)
+    media.acquire(after - before)
+    media.release(before - after)
+    instance._stored_media_names = after
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Story)
+def release_media(sender, instance, **kwargs):
+    media.release(media.instance_media_names(instance))
+
+@receiver(request_finished)
+def release_unclaimed_media(sender, **kwargs):
+    media.release_claims()
+
+@receiver(post_delete, sender=MediaUpload)
+def discard_upload(sender, instance, **kwargs):
+    uploads.discard_upload(instance)
+
+# Story trays: a new story or a new friend changes what friends see
+@receiver(post_save, sender=Story)
+def invalidate_trays_on_story(sender, instance, created, **kwargs):
+    if created:
+        invalidate_story_trays(friend_ids(instance.user))
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_trays_on_follow(sender, instance, **kwargs):
+    invalidate_story_trays([instance.follower_id, instance.followed_id])
+
+# Keep the user search index in step with names
+@receiver(post_save, sender=CustomUser)
+def index_user_names(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'username', 'fullname'} & set(update_fields):
+        search.index_user(instance)
+
+@receiver(post_save, sender=CustomUser)
+def update_username_index(sender, instance, **kwargs):
+    username_index.update(instance.pk, instance.username, instance.is_active)
+
+@receiver(post_delete, sender=CustomUser)
+def remove_from_username_index(sender, instance, **kwargs):
+    username_index.remove(instance.pk)
+
+# Response cache invalidation
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_cache(sender, instance, **kwargs):
+    cache.invalidate(f'user:{instance.pk}')
+    user_state_cache.discard(instance.pk)  # Deactivation applies at once in this process
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_cache(sender, instance, **kwargs):
+    namespaces = [f'post:{instance.pk}', f'comments:{instance.pk}']
+    if instance.original_post_id:
+        namespaces.append(f'post:{instance.original_post_id}')  # Its share count moved
+    cache.invalidate(*namespaces)
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_post_engagement_cache(sender, instance, **kwargs):
+    cache.invalidate(f'post:{instance.post_id}')
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_cache(sender, instance, **kwargs):
+    cache.invalidate(f'post:{instance.post_id}', f'comments:{instance.post_id}')
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_cache(sender, instance, **kwargs):
+    cache.invalidate(
+        f'user:{instance.follower_id}', f'user:{instance.followed_id}',
+        f'friend_stories:{instance.follower_id}', f'friend_stories:{instance.followed_id}',
+    )
+
+@receiver(post_save, sender=Block)
+@receiver(post_delete, sender=Block)
+def invalidate_block_cache(sender, instance, **kwargs):
+    invalidate_hidden_users([instance.blocker_id, instance.blocked_id])
+    invalidate_story_trays([instance.blocker_id, instance.blocked_id])
+    cache.invalidate(f'friend_stories:{instance.blocker_id}', f'friend_stories:{instance.blocked_id}')
+
+@receiver(post_save, sender=Story)
+@receiver(post_delete, sender=Story)
+def invalidate_story_cache(sender, instance, **kwargs):
+    namespaces = []
+    # Friends' story lists only hold active stories, and an expired story's own entry ages out within
+    # the cache timeout, so purging expired stories costs neither a follow lookup nor a version bump
+    if not instance.is_expired:
+        namespaces.append(f'story:{instance.pk}')
+        namespaces += [f'friend_stories:{friend_id}' for friend_id in friend_ids(instance.user)]
+    if instance.shared_post_id:
+        namespaces.append(f'post:{instance.shared_post_id}')
+    cache.invalidate(*namespaces)
+
+# Database connection metrics
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    connection_stats.record_connection(connection.alias)
+
+@receiver(request_started)
+def count_request(sender, **kwargs):
+    connection_stats.record_request()
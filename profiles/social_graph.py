@@ -0,0 +1,171 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+from profiles import counters, feed, search
+from profiles.models import CustomUser, Follow, Post, Like, Comment, Favorite, Story, StoryView
+
+# Synthetic data for load tests and benchmarks.
+#
+# Popularity follows a power law: each user gets a Zipf weight from a random rank, and follows,
+# likes, comments and story views pick their targets by that weight, so a few accounts collect most
+# of the followers and engagement. Out-degrees are Pareto-distributed around the requested mean.
+# Rows are bulk inserted without signals; the derived data (counters, search index, timelines,
+# high-fanout flags) is rebuilt at the end.
+
+GENERATED_USERNAME_PREFIX = 'gen_user_'
+INSERT_BATCH_SIZE = 5000
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    # auto_now_add would overwrite the spread-out timestamps with the insert time
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class SocialGraphGenerator:
+    def __init__(self, users, follows_per_user=20, posts_per_user=5, likes_per_post=3, comments_per_post=1,
+                 story_ratio=0.3, views_per_story=5, zipf_exponent=0.8, days=30, password='password123',
+                 seed=None, batch_size=INSERT_BATCH_SIZE, log=None):
+        self.users = users
+        self.follows_per_user = follows_per_user
+        self.posts_per_user = posts_per_user
+        self.likes_per_post = likes_per_post
+        self.comments_per_post = comments_per_post
+        self.story_ratio = story_ratio
+        self.views_per_story = views_per_story
+        self.zipf_exponent = zipf_exponent
+        self.days = days
+        self.password = password
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def generate(self):
+        user_ids = self.create_users()
+        if not user_ids:
+            return 0
+        self.all_user_ids = list(CustomUser.objects.values_list('id', flat=True))
+        ranks = list(range(len(self.all_user_ids)))
+        self.random.shuffle(ranks)
+        self.popularity = list(accumulate((rank + 1) ** -self.zipf_exponent for rank in ranks))
+
+        self.create_follows(user_ids)
+        post_ids = self.create_posts(user_ids)
+        self.create_engagement(post_ids)
+        self.create_stories(user_ids)
+        self.rebuild_derived_data()
+        return len(user_ids)
+
+    def popular_users(self, count):
+        return self.random.choices(self.all_user_ids, cum_weights=self.popularity, k=count)
+
+    def out_degree(self, mean):
+        # Pareto with shape 2 and scale mean/2 has the requested mean and a heavy tail
+        return min(int(mean / 2 * self.random.paretovariate(2)), len(self.all_user_ids) - 1)
+
+    def timestamp(self, within):
+        return self.now - within * self.random.random()
+
+    def bulk_insert(self, model, rows):
+        model.objects.bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+
+    # MySQL does not return primary keys from bulk inserts, so new rows are found by id range
+    def last_id(self, model):
+        return model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    def create_users(self):
+        start = CustomUser.objects.filter(username__startswith=GENERATED_USERNAME_PREFIX).count()
+        last_id = self.last_id(CustomUser)
+        password = make_password(self.password)  # Hashed once; every generated user shares it
+        usernames = [f'{GENERATED_USERNAME_PREFIX}{index}' for index in range(start, start + self.users)]
+        for offset in range(0, len(usernames), self.batch_size):
+            self.bulk_insert(CustomUser, [
+                CustomUser(
+                    username=username, fullname=f'Generated User {username[len(GENERATED_USERNAME_PREFIX):]}',
+                    email=f'{username}@example.com', dob='1990-01-01', password=password,
+                )
+                for username in usernames[offset:offset + self.batch_size]
+            ])
+        self.log(f'Created {len(usernames)} user(s).')
+        return list(CustomUser.objects.filter(pk__gt=last_id).values_list('id', flat=True))
+
+    def create_follows(self, user_ids):
+        rows = []
+        created = 0
+        for follower_id in user_ids:
+            for followed_id in set(self.popular_users(self.out_degree(self.follows_per_user))) - {follower_id}:
+                rows.append(Follow(follower_id=follower_id, followed_id=followed_id))
+            if len(rows) >= self.batch_size:
+                self.bulk_insert(Follow, rows)
+                created, rows = created + len(rows), []
+        self.bulk_insert(Follow, rows)
+        self.log(f'Created {created + len(rows)} follow(s).')
+
+    def create_posts(self, user_ids):
+        authors = [user_id for user_id in user_ids for _ in range(self.out_degree(self.posts_per_user))]
+        within = timedelta(days=self.days)
+        last_id = self.last_id(Post)
+        with explicit_timestamps(Post._meta.get_field('created_at')):
+            for offset in range(0, len(authors), self.batch_size):
+                self.bulk_insert(Post, [
+                    Post(user_id=user_id, title=f'Post by {user_id}', description='Generated post', created_at=self.timestamp(within))
+                    for user_id in authors[offset:offset + self.batch_size]
+                ])
+        self.log(f'Created {len(authors)} post(s).')
+        return list(Post.objects.filter(pk__gt=last_id).values_list('id', flat=True))
+
+    def create_engagement(self, post_ids):
+        for model, per_post in ((Like, self.likes_per_post), (Favorite, self.likes_per_post / 2), (Comment, self.comments_per_post)):
+            rows = []
+            created = 0
+            for post_id in post_ids:
+                for user_id in set(self.popular_users(self.out_degree(per_post))):
+                    fields = {'content': 'Generated comment'} if model is Comment else {}
+                    rows.append(model(post_id=post_id, user_id=user_id, **fields))
+                if len(rows) >= self.batch_size:
+                    self.bulk_insert(model, rows)
+                    created, rows = created + len(rows), []
+            self.bulk_insert(model, rows)
+            self.log(f'Created {created + len(rows)} {model._meta.verbose_name_plural}.')
+
+    def create_stories(self, user_ids):
+        within = timedelta(hours=settings.STORY_TTL_HOURS)
+        authors = [user_id for user_id in user_ids if self.random.random() < self.story_ratio]
+        last_id = self.last_id(Story)
+        with explicit_timestamps(Story._meta.get_field('created_at')):
+            for offset in range(0, len(authors), self.batch_size):
+                self.bulk_insert(Story, [
+                    Story(user_id=user_id, description='Generated story', created_at=self.timestamp(within))
+                    for user_id in authors[offset:offset + self.batch_size]
+                ])
+        story_ids = list(Story.objects.filter(pk__gt=last_id).values_list('id', flat=True))
+
+        rows = []
+        for story_id in story_ids:
+            for user_id in set(self.popular_users(self.out_degree(self.views_per_story))):
+                rows.append(StoryView(story_id=story_id, user_id=user_id))
+            if len(rows) >= self.batch_size:
+                self.bulk_insert(StoryView, rows)
+                rows = []
+        self.bulk_insert(StoryView, rows)
+        self.log(f'Created {len(story_ids)} stories and their views.')
+
+    def rebuild_derived_data(self):
+        counters.reconcile_follow_counts()
+        counters.reconcile_post_counts()
+        CustomUser.objects.filter(follower_count__gte=settings.FEED_FANOUT_THRESHOLD).update(is_high_fanout=True)
+        search.rebuild_search_index()
+        feed.rebuild_timelines()
+        self.log('Rebuilt counters, search index and timelines.')
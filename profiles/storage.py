@@ -0,0 +1,39 @@
+import hashlib
+import os
+from uuid import uuid4
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from profiles import media
+
+# Content-addressed media storage: a file is stored under the SHA-256 of its bytes, so identical
+# uploads resolve to the same name and are written once. Which rows use a name is tracked by
+# profiles.media, which deletes the file when the last reference goes.
+
+BLOB_DIRECTORY = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return f'{BLOB_DIRECTORY}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        # Referenced before looking for the file, so garbage collection can't delete it after the check
+        media.claim(name)
+        if not self.exists(name):
+            # Written under a unique name and renamed, so concurrent uploads of the same bytes can't collide
+            partial = super()._save(f'{name}.{uuid4().hex}.part', content)
+            os.replace(self.path(partial), self.path(name))
+        return name
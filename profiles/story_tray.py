@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from profiles.models import Follow, Story, StoryView
+from profiles.story_view_buffer import story_view_buffer
+from profiles.blocks import hidden_user_ids
+
+# The story tray groups friends' active stories by author with a per-story seen flag.
+# It is built with a fixed number of queries and cached per viewer. The cache is per process, so a
+# cached tray is filtered by the viewer's shared set of hidden users on every read.
+
+TRAY_CACHE_KEY = 'story_tray:{user_id}'
+
+
+def tray_cache_key(user_id):
+    return TRAY_CACHE_KEY.format(user_id=user_id)
+
+
+def friend_ids(user):
+    pairs = Follow.objects.filter(Q(follower=user) | Q(followed=user)).values_list('follower_id', 'followed_id')
+    return {followed_id if follower_id == user.id else follower_id for follower_id, followed_id in pairs}
+
+
+def build_story_tray(user, serialize_story):
+    stories = (
+        Story.objects.active()
+        .filter(user_id__in=friend_ids(user) - hidden_user_ids(user))
+        .select_related('user')
+        .only('id', 'description', 'image', 'image_variants', 'created_at', 'shared_post_id', 'user__id', 'user__username', 'user__fullname')
+        .annotate(seen=Exists(StoryView.objects.filter(story=OuterRef('pk'), user=user)))
+        .order_by('-created_at', '-id')
+    )
+    buffered_story_ids = story_view_buffer.pending_story_ids(user.id)
+
+    # Authors come out in order of their most recent story; each author's stories play oldest first
+    tray = {}
+    for story in stories:
+        story.seen = story.seen or story.id in buffered_story_ids
+        group = tray.setdefault(story.user_id, {
+            "user": {"id": story.user.id, "username": story.user.username, "fullname": story.user.fullname},
+            "has_unseen": False,
+            "stories": [],
+        })
+        group["has_unseen"] = group["has_unseen"] or not story.seen
+        group["stories"].insert(0, serialize_story(story))
+    return list(tray.values())
+
+
+def get_story_tray(user, serialize_story):
+    key = tray_cache_key(user.id)
+    tray = cache.get(key)
+    if tray is None:
+        tray = build_story_tray(user, serialize_story)
+        cache.set(key, tray, settings.STORY_TRAY_CACHE_TIMEOUT)
+    hidden = hidden_user_ids(user)
+    return [group for group in tray if group["user"]["id"] not in hidden]
+
+
+def invalidate_story_trays(user_ids):
+    cache.delete_many([tray_cache_key(user_id) for user_id in user_ids])
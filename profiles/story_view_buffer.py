@@ -0,0 +1,76 @@
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import DatabaseError, connection
+from profiles.models import Story, StoryView
+
+logger = logging.getLogger(__name__)
+
+# Write-behind buffer for story views: opening a story only records (story_id, user_id) in memory,
+# and the pending views are written with one bulk INSERT when the buffer fills up, when the flush
+# interval elapses, or when the process exits. viewed_at is therefore the flush time, at most one
+# interval after the real view.
+class StoryViewBuffer:
+    def __init__(self, max_size, flush_interval):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, story_id, user_id):
+        with self.lock:
+            self.pending.add((story_id, user_id))
+            full = len(self.pending) >= self.max_size
+            if not full and self.timer is None and self.flush_interval > 0:
+                self.timer = threading.Timer(self.flush_interval, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+        if full:
+            self.flush()
+
+    def pending_user_ids(self, story_id):
+        with self.lock:
+            return {user_id for pending_story_id, user_id in self.pending if pending_story_id == story_id}
+
+    def pending_story_ids(self, user_id):
+        with self.lock:
+            return {story_id for story_id, pending_user_id in self.pending if pending_user_id == user_id}
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, set()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not pending:
+            return 0
+
+        try:
+            # Stories can be deleted between the view and the flush
+            story_ids = set(Story.objects.filter(id__in={story_id for story_id, _ in pending}).values_list('id', flat=True))
+            views = [StoryView(story_id=story_id, user_id=user_id) for story_id, user_id in pending if story_id in story_ids]
+            # Views that were already stored are skipped by the unique index
+            StoryView.objects.bulk_create(views, batch_size=self.max_size, ignore_conflicts=True)
+        except DatabaseError:
+            logger.exception('Could not flush %d buffered story views', len(pending))
+            return 0
+        return len(views)
+
+    def flush_from_timer(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread gets its own connection and ends here; close_old_connections() would keep
+            # it open for CONN_MAX_AGE
+            connection.close()
+
+
+story_view_buffer = StoryViewBuffer(
+    max_size=settings.STORY_VIEW_BUFFER_SIZE,
+    flush_interval=settings.STORY_VIEW_FLUSH_INTERVAL,
+)
+atexit.register(story_view_buffer.flush)
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.db import DatabaseError, connection
+from profiles.models import CustomUser
+from profiles.search import normalize
+
+logger = logging.getLogger(__name__)
+
+# In-process typeahead over active usernames: a sorted list of (normalized username, user id) searched
+# with bisect, so a lookup is a binary search plus a short forward scan and never touches the database.
+#
+# Saves in this process update the list in place; changes made by other processes are picked up by a
+# full reload once the list is older than TYPEAHEAD_RELOAD_INTERVAL seconds. Only the first load runs
+# on a request thread: later reloads run in the background while lookups keep using the old list, and
+# saves made while the rows are being read are replayed onto the new list before it is swapped in.
+class UsernameIndex:
+    def __init__(self, reload_interval):
+        self.reload_interval = reload_interval
+        self.entries = None
+        self.keys = {}
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.pending = None  # {user_id: (username, is_active)} saved during a load
+        self.reloading = False
+
+    def active_usernames(self):
+        return CustomUser.objects.filter(is_active=True).values_list('id', 'username').iterator()
+
+    def load(self):
+        with self.lock:
+            self.pending = {}
+        try:
+            keys = {user_id: (normalize(username), username) for user_id, username in self.active_usernames()}
+        except BaseException:
+            with self.lock:
+                self.pending = None
+            raise
+
+        with self.lock:
+            for user_id, (username, is_active) in self.pending.items():
+                keys.pop(user_id, None)
+                if is_active:
+                    keys[user_id] = (normalize(username), username)
+            entries = sorted((key, user_id) for user_id, (key, _) in keys.items())
+            self.entries, self.keys, self.loaded_at, self.pending = entries, keys, time.monotonic(), None
+
+    def ensure_loaded(self):
+        if self.entries is None:
+            with self.load_lock:
+                if self.entries is None:
+                    self.load()
+        elif time.monotonic() - self.loaded_at > self.reload_interval:
+            self.reload_in_background()
+
+    def reload_in_background(self):
+        with self.lock:
+            if self.reloading:
+                return
+            self.reloading = True
+        threading.Thread(target=self.reload, daemon=True).start()
+
+    def reload(self):
+        try:
+            with self.load_lock:
+                self.load()
+        except DatabaseError:
+            # Keep serving the old list; the next stale lookup tries again
+            logger.exception('Could not reload the username index')
+        finally:
+            with self.lock:
+                self.reloading = False
+            # The reload thread gets its own connection and ends here; close_old_connections() would
+            # keep it open for CONN_MAX_AGE
+            connection.close()
+
+    def update(self, user_id, username, is_active):
+        with self.lock:
+            if self.pending is not None:
+                self.pending[user_id] = (username, is_active)
+            if self.entries is None:
+                return  # Not loaded in this process yet; the first lookup reads the current rows
+            self._remove(user_id)
+            if is_active:
+                key = normalize(username)
+                self.keys[user_id] = (key, username)
+                insort(self.entries, (key, user_id))
+
+    def remove(self, user_id):
+        with self.lock:
+            if self.pending is not None:
+                self.pending[user_id] = (None, False)
+            if self.entries is not None:
+                self._remove(user_id)
+
+    def _remove(self, user_id):
+        previous = self.keys.pop(user_id, None)
+        if previous is not None:
+            index = bisect_left(self.entries, (previous[0], user_id))
+            if index < len(self.entries) and self.entries[index] == (previous[0], user_id):
+                del self.entries[index]
+
+    def suggest(self, prefix, limit, exclude=()):
+        """Return up to `limit` (user_id, username) pairs whose username starts with `prefix`."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        self.ensure_loaded()
+        matches = []
+        with self.lock:
+            index = bisect_left(self.entries, (prefix,))
+            while index < len(self.entries) and len(matches) < limit:
+                key, user_id = self.entries[index]
+                if not key.startswith(prefix):
+                    break
+                if user_id not in exclude:
+                    matches.append((user_id, self.keys[user_id][1]))
+                index += 1
+        return matches
+
+    def clear(self):
+        with self.lock:
+            self.entries, self.keys, self.loaded_at = None, {}, 0
+
+
+username_index = UsernameIndex(reload_interval=settings.TYPEAHEAD_RELOAD_INTERVAL)
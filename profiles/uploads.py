@@ -0,0 +1,156 @@
+import os
+from django.conf import settings
+from django.core.files import File, locks
+from PIL import Image
+from profiles import media
+from profiles.models import MediaUpload, Post
+
+# Chunked, resumable uploads.
+#
+# A client starts an upload with the file's name and size, then appends chunks at the offset the
+# server reports. Each chunk is streamed from the request into a temporary file READ_SIZE bytes at a
+# time, so memory stays bounded whatever the file size, and a dropped connection only loses the chunk
+# in flight: `received` counts every byte written, and the client resumes from there. Completing the
+# upload checks the image and moves it into media storage, where it is held by a media reference
+# until a post or story takes it over.
+
+READ_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+class UploadError(Exception):
+    def __init__(self, status_code, message, upload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.upload = upload
+
+
+def temporary_path(upload):
+    return os.path.join(settings.MEDIA_UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def upload_state(upload):
+    return {
+        'upload_id': upload.pk,
+        'filename': upload.filename,
+        'size': upload.size,
+        'received': upload.received,
+        'status': upload.status,
+        'chunk_size': settings.MEDIA_UPLOAD_CHUNK_SIZE,
+    }
+
+
+def start_upload(user, filename, size):
+    filename = os.path.basename(filename or '')
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadError(400, f"Only {', '.join(sorted(ALLOWED_EXTENSIONS))} images can be uploaded.")
+    if not 0 < size <= settings.MEDIA_UPLOAD_MAX_SIZE:
+        raise UploadError(400, f'Size must be between 1 and {settings.MEDIA_UPLOAD_MAX_SIZE} bytes.')
+
+    upload = MediaUpload.objects.create(user=user, filename=filename, size=size)
+    os.makedirs(settings.MEDIA_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(temporary_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length):
+    """Write `length` bytes from `stream` at `offset` and return the upload with its new offset."""
+    if upload.status != MediaUpload.PENDING:
+        raise UploadError(409, 'Upload is already complete.', upload)
+    if offset != upload.received:
+        raise UploadError(409, f'Chunk must start at offset {upload.received}.', upload)
+    if length > settings.MEDIA_UPLOAD_CHUNK_SIZE:
+        raise UploadError(413, f'Chunks can be at most {settings.MEDIA_UPLOAD_CHUNK_SIZE} bytes.', upload)
+    if offset + length > upload.size:
+        raise UploadError(400, f'Chunk ends past the declared size of {upload.size} bytes.', upload)
+
+    written = 0
+    with open_part(upload, 'r+b') as part:
+        # Serializes writers. The offset is checked again under the lock: a writer that waited here
+        # while another appended must not write over the bytes that were accepted meanwhile
+        locks.lock(part, locks.LOCK_EX)
+        try:
+            upload.refresh_from_db(fields=['received', 'status'])
+            if upload.status != MediaUpload.PENDING:
+                raise UploadError(409, 'Upload is already complete.', upload)
+            if offset != upload.received:
+                raise UploadError(409, f'Chunk must start at offset {upload.received}.', upload)
+
+            part.seek(offset)
+            while written < length:
+                chunk = stream.read(min(READ_SIZE, length - written)) if stream is not None else b''
+                if not chunk:
+                    break  # The client went away; what arrived so far is kept
+                part.write(chunk)
+                written += len(chunk)
+            part.truncate()
+            part.flush()
+            MediaUpload.objects.filter(pk=upload.pk, received=offset).update(received=offset + written)
+        finally:
+            locks.unlock(part)
+
+    upload.received = offset + written
+    return upload
+
+
+def open_part(upload, mode):
+    """Open the upload's temporary file; it is gone once a concurrent request has completed the upload."""
+    try:
+        return open(temporary_path(upload), mode)
+    except FileNotFoundError:
+        upload.refresh_from_db()
+        raise UploadError(409, 'Upload is already complete.', upload)
+
+
+# Lets the storage move the finished temporary file into place instead of copying it
+class TemporaryPartFile(File):
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def complete_upload(upload):
+    if upload.status == MediaUpload.COMPLETE:
+        return upload
+    if upload.received != upload.size:
+        raise UploadError(400, f'Upload has {upload.received} of {upload.size} bytes.', upload)
+
+    path = temporary_path(upload)
+    with open_part(upload, 'rb') as part:
+        # Serializes completions; the loser finds the upload complete once it gets the lock
+        locks.lock(part, locks.LOCK_EX)
+        try:
+            upload.refresh_from_db(fields=['received', 'status'])
+            if upload.status != MediaUpload.PENDING:
+                raise UploadError(409, 'Upload is already complete.', upload)
+            try:
+                with Image.open(part) as image:
+                    image.verify()
+            except (OSError, Image.DecompressionBombError):
+                raise UploadError(400, 'Upload is not a valid image.', upload)
+
+            part.seek(0)
+            storage = Post._meta.get_field('image').storage
+            name = storage.save(upload.filename, TemporaryPartFile(part))
+            media.acquire({name})  # Held by the upload until a post or story references it
+            MediaUpload.objects.filter(pk=upload.pk).update(status=MediaUpload.COMPLETE, blob_name=name)
+        finally:
+            locks.unlock(part)
+
+    if os.path.exists(path):
+        os.remove(path)
+    upload.status, upload.blob_name = MediaUpload.COMPLETE, name
+    return upload
+
+
+def completed_upload(user, upload_id):
+    return MediaUpload.objects.filter(pk=upload_id, user=user, status=MediaUpload.COMPLETE).first()
+
+
+def discard_upload(upload):
+    """Clean up after a deleted upload: its temporary file and its hold on the stored image."""
+    path = temporary_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    if upload.blob_name:
+        media.release({upload.blob_name})
@@ -0,0 +1,7 @@
+from django.urls import path
+from ..views.metrics import CacheStatsView, ConnectionStatsView
+
+urlpatterns = [
+    path('cache/', CacheStatsView.as_view(), name='cache-stats'),
+    path('connections/', ConnectionStatsView.as_view(), name='connection-stats'),
+]
@@ -0,0 +1,8 @@
+from django.urls import path
+from ..views.uploads import CreateUploadView, UploadDetailView, CompleteUploadView
+
+urlpatterns = [
+    path('', CreateUploadView.as_view(), name='create-upload'),
+    path('<uuid:upload_id>', UploadDetailView.as_view(), name='upload-detail'),
+    path('<uuid:upload_id>/complete', CompleteUploadView.as_view(), name='complete-upload'),
+]
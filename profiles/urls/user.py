@@ -1,8 +1,9 @@
 from django.urls import path
-from ..views.users import signup, login, list_users
+from ..views.users import signup, login, list_users, suggest_users
 
 urlpatterns = [
     path('signup/', signup, name='signup'),
     path('login/', login, name='login'),
     path('users/', list_users, name='list_users'),
+    path('users/suggest/', suggest_users, name='suggest_users'),
 ]
@@ -1,8 +1,10 @@
+from django.db import transaction
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from profiles.models import Post, Favorite
 from profiles.serializers.favorite_serializer import FavoriteSerializer
+from profiles.routers import use_read_replica
 
 # Add and remove posts to favorites
 class AddFavoriteView(generics.GenericAPIView):
@@ -15,19 +17,22 @@ class AddFavoriteView(generics.GenericAPIView):
 
         # Check if the post exists
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.engagement_target(post_id)  # Favoriting a reshare favorites the original
         except Post.DoesNotExist:
             return Response({
                 "code": status.HTTP_404_NOT_FOUND,
                 "message": "Post not found."
             }, status=status.HTTP_404_NOT_FOUND)
 
-        # Check if the favorite already exists
-        favorite, created = Favorite.objects.get_or_create(user=user, post=post)
+        # Check if the favorite already exists; the favorite counter moves in the same transaction
+        with transaction.atomic():
+            favorite, created = Favorite.objects.get_or_create(user=user, post=post)
+
+            if not created:
+                # If the favorite already exists, remove it (unfavorite)
+                favorite.delete()
 
         if not created:
-            # If the favorite already exists, remove it (unfavorite)
-            favorite.delete()
             return Response({
                 "code": status.HTTP_200_OK,
                 "message": "Post removed from favorites."
@@ -39,9 +44,11 @@ class AddFavoriteView(generics.GenericAPIView):
         }, status=status.HTTP_201_CREATED)
 
 # List all favorite posts
+@use_read_replica
 class ListFavoritesView(generics.ListAPIView):
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('-id',)  # Favorites have no timestamp; ids grow with insertion time
 
     def get_queryset(self):
         # Filter favorites for the authenticated user
@@ -64,5 +71,6 @@ class ListFavoritesView(generics.ListAPIView):
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved all favorite posts.",
-            "data": response.data
+            "data": response.data,
+            "pagination": self.paginator.get_links()
         })
\ No newline at end of file
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import status, generics, serializers
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
@@ -5,6 +6,12 @@ from rest_framework.permissions import IsAuthenticated
 from ..models import Follow
 from ..serializers import FollowSerializer, UserFollowerCountSerializer, UserFollowingCountSerializer, FollowerWithUsernameSerializer, FollowingWithUsernameSerializer
 from profiles.models import CustomUser
+from profiles.cache import cached_response
+from profiles.routers import use_read_replica
+
+
+def profile_namespaces(view, request, user_id=None, **kwargs):
+    return [f'user:{user_id or request.user.pk}']
 
 # THis is to follow a user
 class FollowUserView(generics.CreateAPIView):
@@ -29,8 +36,9 @@ class FollowUserView(generics.CreateAPIView):
         if follower.id == followed.id:
             raise serializers.ValidationError("You cannot follow yourself.")
         
-        # Save the follow relationship
-        serializer.save(follower=follower, followed=followed)
+        # Save the follow relationship; the follow counters are bumped in the same transaction
+        with transaction.atomic():
+            serializer.save(follower=follower, followed=followed)
 
     def post(self, request, *args, **kwargs):
         user_id = kwargs.get('user_id')
@@ -68,6 +76,11 @@ class UnfollowUserView(generics.DestroyAPIView):
         except Follow.DoesNotExist:
             raise serializers.ValidationError("You are not following this user.")
 
+    def perform_destroy(self, instance):
+        # Delete the follow and decrement the follow counters together
+        with transaction.atomic():
+            instance.delete()
+
     def delete(self, request, *args, **kwargs):
         user_id = kwargs.get('user_id')
         if user_id is None:
@@ -81,15 +94,21 @@ class UnfollowUserView(generics.DestroyAPIView):
         }, status=status.HTTP_200_OK)
     
 # This is to get the total numbet of user's followers
+@use_read_replica
 class UserFollowerCountView(generics.RetrieveAPIView):
     serializer_class = UserFollowerCountSerializer
     permission_classes = [IsAuthenticated]
 
+    @cached_response('followers-count', profile_namespaces)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_object(self):
         user_id = self.kwargs.get('user_id')
         if user_id is None:
-            # Return the profile of the currently authenticated user if no user_id is provided
-            return self.request.user
+            # Return the profile of the currently authenticated user if no user_id is provided;
+            # request.user may be built from token claims, so load the counters from the row
+            user_id = self.request.user.pk
         
         try:
             return CustomUser.objects.get(pk=user_id)
@@ -97,15 +116,21 @@ class UserFollowerCountView(generics.RetrieveAPIView):
             raise NotFound("User not found")
 
 # This is to get the total number of user's followings
+@use_read_replica
 class UserFollowingCountView(generics.RetrieveAPIView):
     serializer_class = UserFollowingCountSerializer
     permission_classes = [IsAuthenticated]
 
+    @cached_response('following-count', profile_namespaces)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_object(self):
         user_id = self.kwargs.get('user_id')
         if user_id is None:
-            # Return the profile of the currently authenticated user if no user_id is provided
-            return self.request.user
+            # Return the profile of the currently authenticated user if no user_id is provided;
+            # request.user may be built from token claims, so load the counters from the row
+            user_id = self.request.user.pk
         
         try:
             return CustomUser.objects.get(pk=user_id)
@@ -113,36 +138,43 @@ class UserFollowingCountView(generics.RetrieveAPIView):
             raise NotFound("User not found")
         
 # This retrieves the list if a user's followers using their username, It displays their username
+@use_read_replica
 class UserFollowersView(generics.ListAPIView):
     serializer_class = FollowerWithUsernameSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('-id',)  # Users have no created_at; ids grow with signup time
 
     def get_queryset(self):
-        # Return a list of users who are following the currently authenticated user
-        return CustomUser.objects.filter(followers__follower=self.request.user).distinct()
+        # Return a list of users who are following the currently authenticated user.
+        # Follow is unique per (follower, followed), so the join cannot produce duplicates.
+        return CustomUser.objects.filter(following__followed=self.request.user).only('id', 'username', 'fullname')
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
         return Response({
             "code": 200,
             "message": "Successfully retrieved followers",
-            "data": serializer.data
+            "data": serializer.data,
+            "pagination": self.paginator.get_links()
         }, status=status.HTTP_200_OK)
 
+@use_read_replica
 class UserFollowingView(generics.ListAPIView):
     serializer_class = FollowingWithUsernameSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('-id',)  # Users have no created_at; ids grow with signup time
 
     def get_queryset(self):
         # Return a list of users whom the currently authenticated user is following
-        return CustomUser.objects.filter(following__follower=self.request.user).distinct()
+        return CustomUser.objects.filter(followers__follower=self.request.user).only('id', 'username', 'fullname')
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
         return Response({
             "code": 200,
             "message": "Successfully retrieved followings",
-            "data": serializer.data
+            "data": serializer.data,
+            "pagination": self.paginator.get_links()
         }, status=status.HTTP_200_OK)
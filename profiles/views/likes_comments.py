@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import generics, status
 from rest_framework.exceptions import NotFound
 from django.core.exceptions import PermissionDenied
@@ -6,6 +7,9 @@ from rest_framework.response import Response
 from profiles.models import Post, Like, Comment
 from profiles.serializers.like_serializer import LikeSerializer
 from profiles.serializers.comment_serializer import CommentSerializer
+from profiles.cache import cached_response
+from profiles.blocks import hidden_user_ids
+from profiles.routers import use_read_replica
 
 # Like/Unlike a post
 class LikePostView(generics.GenericAPIView):
@@ -17,19 +21,22 @@ class LikePostView(generics.GenericAPIView):
         post_id = kwargs.get('post_id')
 
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.engagement_target(post_id)  # Likes on a reshare count toward the original
         except Post.DoesNotExist:
             return Response({
                 "code": status.HTTP_404_NOT_FOUND,
                 "message": "Post not found."
             }, status=status.HTTP_404_NOT_FOUND)
 
-        # Check if the user has already liked the post
-        like, created = Like.objects.get_or_create(user=user, post=post)
+        # Check if the user has already liked the post; the like counter moves in the same transaction
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=user, post=post)
+
+            if not created:
+                # If the like already exists, remove it (unlike)
+                like.delete()
 
         if not created:
-            # If the like already exists, remove it (unlike)
-            like.delete()
             return Response({
                 "code": status.HTTP_200_OK,
                 "message": "Post unliked successfully."
@@ -48,13 +55,14 @@ class CommentOnPostView(generics.CreateAPIView):
     def perform_create(self, serializer):
         post_id = self.kwargs.get('post_id')
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.engagement_target(post_id)  # Comments on a reshare go to the original
         except Post.DoesNotExist:
             # Raise a proper DRF exception
             raise NotFound(detail="Post not found.")
 
         # Save the comment with the user and post fields
-        serializer.save(user=self.request.user, post=post)
+        with transaction.atomic():
+            serializer.save(user=self.request.user, post=post)
 
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
@@ -97,6 +105,10 @@ class DeleteCommentView(generics.DestroyAPIView):
         except Comment.DoesNotExist:
             raise NotFound(detail="Comment not found.")
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
     def delete(self, request, *args, **kwargs):
         comment = self.get_object()
         if comment.user != request.user:
@@ -137,25 +149,35 @@ class DeleteAnyCommentView(generics.DestroyAPIView):
             "message": "Comment deleted successfully."
         }, status=status.HTTP_200_OK)
 
+# Comments made through a reshare are stored on the original, so its listing lives under the original's namespace
+def comment_namespaces(view, request, post_id, **kwargs):
+    original_post_id = Post.objects.filter(pk=post_id).values_list('original_post_id', flat=True).first()
+    return [f'comments:{original_post_id or post_id}']
+
 # Get all comments on a post
+@use_read_replica
 class PostCommentsView(generics.ListAPIView):
     serializer_class = CommentSerializer
     permission_classes = [AllowAny]  # Allow all users to view comments
+    cursor_ordering = ('created_at', 'id')  # Oldest first, in conversation order
 
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.engagement_target(post_id)  # A reshare lists the original's comments
         except Post.DoesNotExist:
             return Comment.objects.none()  # Return an empty queryset if the post is not found
 
-        return post.comments.all()
+        return post.comments.exclude(user_id__in=hidden_user_ids(self.request.user))
 
+    # Viewers with the same blocks share an entry; most viewers have none
+    @cached_response('post-comments', comment_namespaces, vary_on_blocks=True)
     def get(self, request, *args, **kwargs):
         post_id = kwargs.get('post_id')
-        post = Post.objects.filter(id=post_id).first()  # Check if the post exists
-        
-        if not post:
+        # Check if the post exists, and that neither it nor the post it reshares is by a hidden author
+        post_exists = Post.objects.filter(id=post_id).exclude_authors(hidden_user_ids(request.user)).exists()
+
+        if not post_exists:
             return Response({
                 "code": status.HTTP_404_NOT_FOUND,
                 "message": "Post not found."
@@ -165,6 +187,7 @@ class PostCommentsView(generics.ListAPIView):
         response.data = {
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved all post comments.",
-            "data": response.data
+            "data": response.data,
+            "pagination": self.paginator.get_links()
         }
         return Response(response.data, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -0,0 +1,28 @@
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from profiles.cache import cache_stats
+from profiles.db_metrics import connection_stats
+
+# Response cache hit/miss counters for this worker process
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "code": status.HTTP_200_OK,
+            "message": "Successfully retrieved cache statistics.",
+            "data": cache_stats.snapshot()
+        }, status=status.HTTP_200_OK)
+
+# Database connection reuse for this worker process
+class ConnectionStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "code": status.HTTP_200_OK,
+            "message": "Successfully retrieved connection statistics.",
+            "data": connection_stats.snapshot()
+        }, status=status.HTTP_200_OK)
@@ -1,8 +1,14 @@
+from django.db import transaction
 from rest_framework import status, generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from profiles.models import Post, Follow
-from profiles.serializers import PostSerializer, TimelinePostSerializer 
+from profiles.models import Post
+from profiles.serializers import PostSerializer
+from profiles.feed import following_feed, friends_feed
+from profiles.cache import cached_response
+from profiles.conditional import ConditionalPostListMixin
+from profiles.blocks import hidden_user_ids
+from profiles.routers import use_read_replica
 
 # Make a post
 class CreatePostView(generics.CreateAPIView):
@@ -10,7 +16,9 @@ class CreatePostView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        post = serializer.save(user=self.request.user)
+        # request.user may be built from token claims; read the author back for the response
+        serializer.instance = Post.objects.with_author().get(pk=post.pk)
 
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
@@ -21,19 +29,36 @@ class CreatePostView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 # View all posts in the app 
-class PostListView(generics.ListAPIView):
-    queryset = Post.objects.all()
+@use_read_replica
+class PostListView(ConditionalPostListMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return Post.objects.exclude_authors(hidden_user_ids(self.request.user)).with_author()
+
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return response
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved all posts.",
-            "data": response.data
+            "data": response.data,
+            "pagination": self.paginator.get_links()
         }, status=status.HTTP_200_OK)
 
+# The entry shows its author's name, and a reshare the original's content, counters and author
+def post_dependencies(data):
+    namespaces = [f"user:{data['user']}"]
+    if data['original_post']:
+        namespaces += [f"post:{data['original_post']['id']}", f"user:{data['original_post']['user']}"]
+    return namespaces
+
+# A reshare shows the original's counters, so it is as new as the newer of the two
+def post_last_modified(data):
+    return max(filter(None, [data['updated_at'], (data['original_post'] or {}).get('updated_at')]))
+
 # Update a post and Delete a post
 class PostUpdateView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PostSerializer
@@ -41,7 +66,13 @@ class PostUpdateView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         # Ensure users can only access their own posts
-        return Post.objects.filter(user=self.request.user)
+        return Post.objects.filter(user=self.request.user).with_author()
+
+    # Cached per viewer because the post carries liked_by_me / favorited_by_me
+    @cached_response('post-detail', lambda view, request, pk, **kwargs: [f'post:{pk}'], per_user=True,
+                     depends_on=post_dependencies, last_modified=post_last_modified)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def update(self, request, *args, **kwargs):
         post = self.get_object()
@@ -77,46 +108,50 @@ class PostUpdateView(generics.RetrieveUpdateDestroyAPIView):
         }, status=status.HTTP_200_OK)
 
 # Retrieve posts of people you are following
-class FollowingPostsView(generics.ListAPIView):
+@use_read_replica
+class FollowingPostsView(ConditionalPostListMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        following_ids = Follow.objects.filter(follower=user).values_list('followed_id', flat=True)
-        return Post.objects.filter(user_id__in=following_ids)
+        # Pushed timeline entries merged with posts pulled from high-fanout authors
+        return following_feed(self.request.user)
 
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return response
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved posts from users you are following.",
-            "data": response.data
+            "data": response.data,
+            "pagination": self.paginator.get_links()
         }, status=status.HTTP_200_OK)
 
 # Retrieve posts of people you are following and those following you
-class FollowingAndFollowersPostsView(generics.ListAPIView):
+@use_read_replica
+class FollowingAndFollowersPostsView(ConditionalPostListMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        following_ids = Follow.objects.filter(follower=user).values_list('followed_id', flat=True)
-        followers_ids = Follow.objects.filter(followed=user).values_list('follower_id', flat=True)
-        user_ids = set(following_ids).union(set(followers_ids))
-        return Post.objects.filter(user_id__in=user_ids)
+        # Pushed timeline entries merged with posts pulled from high-fanout authors
+        return friends_feed(self.request.user)
 
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return response
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved posts from users you are following and those following you.",
-            "data": response.data
+            "data": response.data,
+            "pagination": self.paginator.get_links()
         }, status=status.HTTP_200_OK)
 
-# Share a post to the timeline
+# Reshare a post to the timeline: a new post that points at the original instead of copying it
 class SharePostToTimelineView(generics.CreateAPIView):
-    serializer_class = TimelinePostSerializer
+    serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -129,27 +164,23 @@ class SharePostToTimelineView(generics.CreateAPIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            post = Post.objects.get(id=post_id)
+            # Resharing a reshare shares the original
+            original = Post.objects.engagement_target(post_id)
         except Post.DoesNotExist:
+            original = None
+        if original is None or original.user_id in hidden_user_ids(request.user):
             return Response({
                 "code": status.HTTP_404_NOT_FOUND,
                 "message": "Post not found."
             }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Create a new post on the timeline
-        timeline_post_data = {
-            'title': post.title,
-            'description': post.description,
-            'image': post.image,
-            'user': request.user.id 
-        }
-        
-        serializer = self.get_serializer(data=timeline_post_data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)  # Explicitly set the user field
-        
+
+        # The original's share counter moves with the insert
+        with transaction.atomic():
+            reshare = Post.objects.create(user=request.user, original_post=original, caption=request.data.get('caption') or None)
+
+        serializer = self.get_serializer(Post.objects.with_author().get(pk=reshare.pk))
         return Response({
             "code": status.HTTP_201_CREATED,
             "message": "Post reshared to timeline successfully.",
             "data": serializer.data
-        }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        }, status=status.HTTP_201_CREATED)
@@ -1,8 +1,15 @@
+from django.db import transaction
 from rest_framework import status, generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from ..models import Story, Follow, StoryView, Post
-from profiles.serializers.story_serializer import StorySerializer, StoryViewSerializer
+from profiles.serializers.story_serializer import StorySerializer, StoryViewSerializer, TrayStorySerializer
+from profiles.story_view_buffer import story_view_buffer
+from profiles.story_tray import get_story_tray, invalidate_story_trays
+from profiles.cache import cached_response
+from profiles.images import variants_are_current
+from profiles.blocks import hidden_user_ids
+from profiles.routers import use_read_replica
 
 # Add a story
 class CreateStoryView(generics.CreateAPIView):
@@ -21,6 +28,7 @@ class CreateStoryView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 # Get all stories of friends (followers and followings)
+@use_read_replica
 class FriendStoriesView(generics.ListAPIView):
     serializer_class = StorySerializer
     permission_classes = [IsAuthenticated]
@@ -29,23 +37,44 @@ class FriendStoriesView(generics.ListAPIView):
         user = self.request.user
         following_ids = Follow.objects.filter(follower=user).values_list('followed_id', flat=True)
         followers_ids = Follow.objects.filter(followed=user).values_list('follower_id', flat=True)
-        friend_ids = set(following_ids).union(set(followers_ids))
-        return Story.objects.filter(user_id__in=friend_ids)
+        friend_ids = set(following_ids).union(set(followers_ids)) - hidden_user_ids(user)
+        return Story.objects.active().filter(user_id__in=friend_ids)
 
+    @cached_response('friend-stories', lambda view, request, **kwargs: [f'friend_stories:{request.user.pk}'], per_user=True,
+                     vary_on_blocks=True, depends_on=lambda data: [f"story:{story['id']}" for story in data['data']])
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved all stories from friends.",
-            "data": response.data
+            "data": response.data,
+            "pagination": self.paginator.get_links()
+        }, status=status.HTTP_200_OK)
+
+# Get friends' active stories grouped by author, with seen flags
+class StoryTrayView(generics.GenericAPIView):
+    serializer_class = TrayStorySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        tray = get_story_tray(request.user, lambda story: self.get_serializer(story).data)
+        return Response({
+            "code": status.HTTP_200_OK,
+            "message": "Successfully retrieved story tray.",
+            "data": tray
         }, status=status.HTTP_200_OK)
 
 # View any story
 class ViewStoryView(generics.RetrieveAPIView):
-    queryset = Story.objects.all()
     serializer_class = StorySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        # Built per request so the expiry cutoff moves with the clock
+        return Story.objects.active().exclude(user_id__in=hidden_user_ids(self.request.user))
+
+    @cached_response('view-story', lambda view, request, pk, **kwargs: [f'story:{pk}'], vary_on_blocks=True,
+                     last_modified=lambda data: data['data']['updated_at'])
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
         return Response({
@@ -61,7 +90,7 @@ class TrackStoryView(generics.GenericAPIView):
     def get_queryset(self):
         # Get the story object based on the URL parameters
         story_id = self.kwargs.get('pk')
-        return Story.objects.filter(id=story_id)
+        return Story.objects.active().filter(id=story_id).exclude(user_id__in=hidden_user_ids(self.request.user))
 
     def get(self, request, *args, **kwargs):
         # Retrieve the story object
@@ -75,8 +104,9 @@ class TrackStoryView(generics.GenericAPIView):
 
         user = request.user
         
-        # Track the view
-        StoryView.objects.get_or_create(story=story, user=user)
+        # Track the view; it is written to the database in the next buffer flush
+        story_view_buffer.add(story.id, user.id)
+        invalidate_story_trays([user.id])  # The story is now seen in this viewer's tray
         
         serializer = self.get_serializer(story)
         return Response({
@@ -86,29 +116,45 @@ class TrackStoryView(generics.GenericAPIView):
         }, status=status.HTTP_200_OK)
     
 # Get viewers of a story
+@use_read_replica
 class StoryViewersView(generics.ListAPIView):
     serializer_class = StoryViewSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('-viewed_at', '-id')
 
     def get_queryset(self):
         story_id = self.kwargs.get('story_id')
-        return StoryView.objects.filter(story_id=story_id)
+        # Buffered views appear once they are flushed, within STORY_VIEW_FLUSH_INTERVAL; flushing here
+        # would write from a request that reads from the replica
+        return (
+            StoryView.objects.filter(story_id=story_id)
+            .select_related('user')
+            .only('id', 'story_id', 'viewed_at', 'user__id', 'user__username')
+        )
 
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved story viewers.",
-            "data": response.data
+            "data": response.data,
+            "pagination": self.paginator.get_links()
         }, status=status.HTTP_200_OK)
 
 # Get total count of viewers of a story
+@use_read_replica
 class StoryViewCountView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         story_id = self.kwargs.get('story_id')
-        count = StoryView.objects.filter(story_id=story_id).count()
+        stored_views = StoryView.objects.filter(story_id=story_id)
+        count = stored_views.count()
+
+        # Add buffered views that have not been written yet
+        buffered_user_ids = story_view_buffer.pending_user_ids(story_id)
+        if buffered_user_ids:
+            count += len(buffered_user_ids) - stored_views.filter(user_id__in=buffered_user_ids).count()
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved story view count.",
@@ -130,8 +176,10 @@ class SharePostToStoryView(generics.CreateAPIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.engagement_target(post_id)  # A reshare is shared as its original
         except Post.DoesNotExist:
+            post = None
+        if post is None or post.user_id in hidden_user_ids(request.user):
             return Response({
                 "code": status.HTTP_404_NOT_FOUND,
                 "message": "Post not found."
@@ -140,15 +188,18 @@ class SharePostToStoryView(generics.CreateAPIView):
         # Prepare the data for Story creation
         story_data = {
             'description': post.description,
-            'image': post.image,
             'shared_post': post.id
         }
 
         serializer = self.get_serializer(data=story_data)
         serializer.is_valid(raise_exception=True)
 
-        # Save the story with the current user
-        story = serializer.save(user=request.user)
+        # Save the story with the current user and count the share on the post. The story references
+        # the post's stored image and variants by name instead of re-reading, re-validating and
+        # re-encoding the file; variants still being rendered for the post are rendered for the story too.
+        variants = post.image_variants if variants_are_current(post) else {}
+        with transaction.atomic():
+            story = serializer.save(user=request.user, image=post.image.name or None, image_variants=variants)
 
         return Response({
             "code": status.HTTP_201_CREATED,
@@ -0,0 +1,103 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from profiles.models import MediaUpload
+from profiles.uploads import UploadError, append_chunk, complete_upload, start_upload, upload_state
+
+
+def error_response(error):
+    response = {"code": error.status_code, "message": error.message}
+    if error.upload is not None:
+        response["data"] = upload_state(error.upload)  # Tells the client where to resume
+    return Response(response, status=error.status_code)
+
+
+class UploadMixin:
+    def get_upload(self, request, upload_id):
+        return MediaUpload.objects.filter(pk=upload_id, user=request.user).first()
+
+    def not_found(self):
+        return Response({
+            "code": status.HTTP_404_NOT_FOUND,
+            "message": "Upload not found."
+        }, status=status.HTTP_404_NOT_FOUND)
+
+# Start a chunked upload
+class CreateUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response({
+                "code": status.HTTP_400_BAD_REQUEST,
+                "message": "Size is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            upload = start_upload(request.user, request.data.get('filename'), size)
+        except UploadError as error:
+            return error_response(error)
+        return Response({
+            "code": status.HTTP_201_CREATED,
+            "message": "Upload started.",
+            "data": upload_state(upload)
+        }, status=status.HTTP_201_CREATED)
+
+# Check an upload's progress, or append the next chunk. The chunk is the raw request body and its
+# position is the Upload-Offset header; the body is streamed to disk and never parsed.
+class UploadDetailView(UploadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id, *args, **kwargs):
+        upload = self.get_upload(request, upload_id)
+        if upload is None:
+            return self.not_found()
+        return Response({
+            "code": status.HTTP_200_OK,
+            "message": "Successfully retrieved upload.",
+            "data": upload_state(upload)
+        }, status=status.HTTP_200_OK)
+
+    def patch(self, request, upload_id, *args, **kwargs):
+        upload = self.get_upload(request, upload_id)
+        if upload is None:
+            return self.not_found()
+        try:
+            offset = int(request.headers.get('Upload-Offset'))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (TypeError, ValueError):
+            return Response({
+                "code": status.HTTP_400_BAD_REQUEST,
+                "message": "Upload-Offset header is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            upload = append_chunk(upload, offset, request.stream, length)
+        except UploadError as error:
+            return error_response(error)
+        return Response({
+            "code": status.HTTP_200_OK,
+            "message": "Chunk received.",
+            "data": upload_state(upload)
+        }, status=status.HTTP_200_OK)
+
+# Finish an upload once every byte has arrived; its upload_id can then be given to a new post or story
+class CompleteUploadView(UploadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id, *args, **kwargs):
+        upload = self.get_upload(request, upload_id)
+        if upload is None:
+            return self.not_found()
+        try:
+            upload = complete_upload(upload)
+        except UploadError as error:
+            return error_response(error)
+        return Response({
+            "code": status.HTTP_200_OK,
+            "message": "Upload complete.",
+            "data": upload_state(upload)
+        }, status=status.HTTP_200_OK)
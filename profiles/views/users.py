@@ -1,11 +1,17 @@
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
 from ..serializers.users import UserSerializer, SimpleUserSerializer, DetailedUserSerializer
 from ..models.users import CustomUser
 from profiles.permissions import IsAuthenticatedCustom
+from profiles.pagination import CursorPagination
+from profiles.authentication import token_for_user
+from profiles.search import search_users
+from profiles.typeahead import username_index
+from profiles.blocks import hidden_user_ids
+from profiles.routers import use_read_replica
 
 # Signup request method
 @api_view(['POST'])
@@ -43,23 +49,12 @@ def login(request):
             "error": "Username or email and password are required"
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    # Authenticate user by username
-    user = authenticate(username=username_or_email, password=password)
-    
-    if user is None:
-        # If username fails, try email
-        try:
-            user = CustomUser.objects.get(email=username_or_email)
-            if user.check_password(password):
-                user = authenticate(username=user.username, password=password)
-            else:
-                user = None
-        except CustomUser.DoesNotExist:
-            user = None
+    # Resolves a username or an email in one lookup (see profiles.backends)
+    user = authenticate(request, username=username_or_email, password=password)
 
     if user is not None:
         # Generate JWT token
-        refresh = RefreshToken.for_user(user)
+        refresh = token_for_user(user)
         access_token = str(refresh.access_token)
         return Response({
             "code": status.HTTP_200_OK,
@@ -74,6 +69,7 @@ def login(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 # List all users (excluding the current user)
+@use_read_replica
 @api_view(['GET'])
 def list_users(request):
     # Check permission
@@ -85,31 +81,71 @@ def list_users(request):
 
     # Get the search query from request parameters
     search_query = request.query_params.get('username', None)
+    paginator = CursorPagination()
+    paginator.ordering = ('id',)
+    # The viewer and anyone on either side of a block with them
+    excluded_ids = {request.user.id, *hidden_user_ids(request.user)}
     
     if search_query:
-        # Filter users based on the search query
-        users = CustomUser.objects.filter(username__icontains=search_query).exclude(id=request.user.id)
-        
-        if not users.exists():
+        # Ranked lookup in the user search index (see profiles.search)
+        users = search_users(search_query)
+        page = None
+        if users is not None:
+            paginator.ordering = ('-search_rank', '-id')
+            users = users.exclude(id__in=excluded_ids).only('id', 'username', 'fullname', 'email')
+            page = paginator.paginate_queryset(users, request)
+
+        # An empty later page is still a valid page; only an empty first page means no match
+        if page is None or (not page and not request.query_params.get(paginator.cursor_query_param)):
             return Response({
                 "code": status.HTTP_404_NOT_FOUND,
                 "error": "User not found"
             }, status=status.HTTP_404_NOT_FOUND)
-        
-        serializer = DetailedUserSerializer(users, many=True)
-        
+
+        serializer = DetailedUserSerializer(page, many=True)
+
         return Response({
             "code": status.HTTP_200_OK,
             "message": "Successfully retrieved user(s)",
-            "data": serializer.data
+            "data": serializer.data,
+            "pagination": paginator.get_links()
         }, status=status.HTTP_200_OK)
-    
+
     # Return all users excluding the current user if no search query
-    users = CustomUser.objects.exclude(id=request.user.id)
-    serializer = SimpleUserSerializer(users, many=True)
+    users = CustomUser.objects.exclude(id__in=excluded_ids)
+    page = paginator.paginate_queryset(users, request)
+    serializer = SimpleUserSerializer(page, many=True)
     
     return Response({
         "code": status.HTTP_200_OK,
         "message": "Successfully retrieved all users",
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+        "data": serializer.data,
+        "pagination": paginator.get_links()
+    }, status=status.HTTP_200_OK)
+
+# Username suggestions for mentions and autocomplete, served from the in-process username index
+@api_view(['GET'])
+def suggest_users(request):
+    if not IsAuthenticatedCustom().has_permission(request, None):
+        return Response({
+            "code": status.HTTP_401_UNAUTHORIZED,
+            "error": "Authentication credentials were not provided"
+        }, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        limit = min(int(request.query_params.get('limit', settings.TYPEAHEAD_LIMIT)), settings.TYPEAHEAD_MAX_LIMIT)
+    except ValueError:
+        return Response({
+            "code": status.HTTP_400_BAD_REQUEST,
+            "error": "limit must be a number"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Hide the viewer and anyone on either side of a block with them
+    excluded_ids = {request.user.id, *hidden_user_ids(request.user)}
+    matches = username_index.suggest(request.query_params.get('q', ''), max(limit, 0), exclude=excluded_ids)
+
+    return Response({
+        "code": status.HTTP_200_OK,
+        "message": "Successfully retrieved suggestions",
+        "data": [{"id": user_id, "username": username} for user_id, username in matches]
+    }, status=status.HTTP_200_OK)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -48,6 +49,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'profiles.authentication.CustomJWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'profiles.pagination.CursorPagination',
     'PAGE_SIZE': 10
 }
 
@@ -64,6 +66,49 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# 'token' builds request.user from the signed token claims instead of loading it on every request;
+# 'database' loads the user row like simplejwt does by default
+JWT_AUTH_USER_MODE = config('JWT_AUTH_USER_MODE', default='token')
+# Seconds a user's active/admin state is trusted before it is re-read; bounds how long a deactivation takes
+JWT_USER_STATE_TTL = config('JWT_USER_STATE_TTL', default=60, cast=int)
+JWT_USER_STATE_CACHE_SIZE = config('JWT_USER_STATE_CACHE_SIZE', default=10000, cast=int)
+
+# Home timeline settings; prune_timelines deletes the entries past TIMELINE_MAX_LENGTH in each timeline
+TIMELINE_MAX_LENGTH = config('TIMELINE_MAX_LENGTH', default=800, cast=int)
+TIMELINE_BACKFILL_SIZE = config('TIMELINE_BACKFILL_SIZE', default=50, cast=int)
+# Authors with at least this many followers are pulled into feeds at read time instead of fanned out
+FEED_FANOUT_THRESHOLD = config('FEED_FANOUT_THRESHOLD', default=10000, cast=int)
+
+# Stories disappear from every read path after this many hours and are purged by `purge_expired_stories`
+STORY_TTL_HOURS = config('STORY_TTL_HOURS', default=24, cast=int)
+
+# Story views are buffered in memory and written in bulk once this many are pending or the interval (seconds) passes
+STORY_VIEW_BUFFER_SIZE = config('STORY_VIEW_BUFFER_SIZE', default=500, cast=int)
+STORY_VIEW_FLUSH_INTERVAL = config('STORY_VIEW_FLUSH_INTERVAL', default=5.0, cast=float)
+# Seconds a viewer's story tray stays cached; new stories and follows invalidate it earlier
+STORY_TRAY_CACHE_TIMEOUT = config('STORY_TRAY_CACHE_TIMEOUT', default=60, cast=int)
+
+# Seconds a viewer's set of blocked/blocking users stays cached; toggling a block invalidates it earlier
+BLOCK_CACHE_TIMEOUT = config('BLOCK_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Username typeahead; each process reloads its index this often to see other processes' changes
+TYPEAHEAD_RELOAD_INTERVAL = config('TYPEAHEAD_RELOAD_INTERVAL', default=300, cast=int)
+TYPEAHEAD_LIMIT = config('TYPEAHEAD_LIMIT', default=10, cast=int)
+TYPEAHEAD_MAX_LIMIT = config('TYPEAHEAD_MAX_LIMIT', default=50, cast=int)
+
+# Post and story images are resized to each size (longest edge, in pixels) and encoded as WebP and JPEG
+# on a pool of this many threads after upload; 0 encodes inline, after the upload's transaction commits
+IMAGE_VARIANT_SIZES = {'thumb': 150, 'feed': 640, 'full': 1080}
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=80, cast=int)
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+
+# Chunked uploads: parts are written here until completed, each request appends at most CHUNK_SIZE
+# bytes, and uploads not attached to a post or story within TTL_HOURS are purged by `purge_stale_uploads`
+MEDIA_UPLOAD_TEMP_DIR = config('MEDIA_UPLOAD_TEMP_DIR', default=str(Path(tempfile.gettempdir()) / 'social-media-uploads'))
+MEDIA_UPLOAD_MAX_SIZE = config('MEDIA_UPLOAD_MAX_SIZE', default=50 * 1024 * 1024, cast=int)
+MEDIA_UPLOAD_CHUNK_SIZE = config('MEDIA_UPLOAD_CHUNK_SIZE', default=5 * 1024 * 1024, cast=int)
+MEDIA_UPLOAD_TTL_HOURS = config('MEDIA_UPLOAD_TTL_HOURS', default=24, cast=int)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -72,6 +117,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'profiles.routers.ReadReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'social_media_backend.urls'
@@ -106,12 +152,68 @@ DATABASES = {
         'PASSWORD': config('DATABASE_PASSWORD'),
         'HOST': config('DATABASE_HOST'),
         'PORT': config('DATABASE_PORT'),
+        # Seconds a worker keeps its connection open between requests; 0 reconnects on every request,
+        # and None keeps it open until it breaks
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60, cast=lambda value: None if value == 'None' else int(value)),
+        # Ping a reused connection before the first query of a request and reconnect if it is dead
+        'CONN_HEALTH_CHECKS': config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool),
+    }
+}
+
+# Optional read replica for the list and count endpoints marked with profiles.routers.use_read_replica.
+# It shares the primary's settings except where overridden; tests read it through the primary.
+if config('DATABASE_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config('DATABASE_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'USER': config('DATABASE_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DATABASE_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': config('DATABASE_REPLICA_HOST'),
+        'PORT': config('DATABASE_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['profiles.routers.ReadReplicaRouter']
+# Seconds a user's reads stay on the primary after they write, to cover replication lag
+READ_REPLICA_STICKY_SECONDS = config('READ_REPLICA_STICKY_SECONDS', default=5, cast=int)
+
+# Caching
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='social-media-backend'),
+    },
+    # State every worker must see as soon as it changes, such as block lists. The default database cache
+    # is shared by all processes (create its table with `manage.py createcachetable`); Redis or Memcached
+    # are faster choices
+    'shared': {
+        'BACKEND': config('SHARED_CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('SHARED_CACHE_LOCATION', default='shared_cache'),
+        # Past MAX_ENTRIES the database cache culls keys in alphabetical order, live ones included; the
+        # default of 300 would drop block lists and replica pins once a few hundred users are active
+        'OPTIONS': {'MAX_ENTRIES': config('SHARED_CACHE_MAX_ENTRIES', default=100000, cast=int)},
+    },
+}
+
+# Response cache for hot read endpoints; BACKEND is any profiles.cache.CacheBackend implementation
+RESPONSE_CACHE = {
+    'BACKEND': config('RESPONSE_CACHE_BACKEND', default='profiles.cache.DjangoCacheBackend'),
+    'ALIAS': 'default',
+    # Namespace versions must be seen by every worker for an invalidation to reach them all
+    'VERSION_ALIAS': 'shared',
+    'TIMEOUT': config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int),
 }
 
 # custom user model
 AUTH_USER_MODEL = 'profiles.CustomUser'
 
+# Logins accept a username or an email and hash the password once per attempt
+AUTHENTICATION_BACKENDS = [
+    'profiles.backends.UsernameOrEmailBackend',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -148,6 +250,12 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded media is stored by content hash, so identical files are written once and shared
+STORAGES = {
+    'default': {'BACKEND': 'profiles.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -24,4 +24,6 @@ urlpatterns = [
     path('api/users/posts/', include('profiles.urls.posts')),
     path('api/users/block/', include('profiles.urls.block')),
     path('api/users/stories/', include('profiles.urls.story')),
+    path('api/uploads/', include('profiles.urls.uploads')),
+    path('api/metrics/', include('profiles.urls.metrics')),
 ]
\ No newline at end of file